@@ -0,0 +1,138 @@
+import numpy as np
+from tracker import Tracker
+
+class Blob:
+	"""A connected region of a thresholded likelihood map: its bounding box, area and mean score."""
+	def __init__(self, box: tuple, area: int, score: float, bg_margin: int = 10, mode: str = "TOPLEFT") -> None:
+		self.box = box # (x1, y1, x2, y2), x2 and y2 exclusive
+		self.area = area
+		self.score = score
+		self.bg_margin = bg_margin
+		self.mode = mode
+
+	@property
+	def mass(self) -> float:
+		return self.area * self.score
+
+	@property
+	def tracker(self) -> Tracker:
+		"""A tracker with the blob's box as its fg."""
+		x1, y1, x2, y2 = self.box
+		if self.mode == "CENTER": return Tracker((x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, bg_margin=self.bg_margin, mode="CENTER")
+		return Tracker(x1, y1, x2 - x1, y2 - y1, bg_margin=self.bg_margin, mode="TOPLEFT")
+
+	def __repr__(self) -> str:
+		return "Blob(box: %s area: %d score: %.2f)" % (self.box, self.area, self.score)
+
+def runs(mask) -> tuple:
+	"""Returns the horizontal runs of True pixels of a 2-D mask as (rows, starts, ends), ends exclusive, in row order."""
+	h, w = mask.shape
+	padded = np.zeros((h, w + 2), dtype=np.int8)
+	padded[:, 1:-1] = mask
+	changes = np.diff(padded, axis=1)
+	rows, starts = np.nonzero(changes == 1)
+	_, ends = np.nonzero(changes == -1)
+	return (rows, starts, ends)
+
+def union_find(count: int, a, b):
+	"""Returns the root of every node of a graph with <count> nodes and edges a[i] - b[i].
+
+	Roots are merged a whole layer of edges at a time, always into the smaller root, and the
+	trees are flattened by pointer jumping, so it takes few passes over the edges."""
+	parent = np.arange(count)
+	while len(a):
+		pa, pb = (parent[a], parent[b])
+		different = pa != pb
+		if not different.any(): break
+		a, b, pa, pb = (a[different], b[different], pa[different], pb[different])
+		np.minimum.at(parent, np.maximum(pa, pb), np.minimum(pa, pb))
+		while True:
+			grandparent = parent[parent]
+			if np.array_equal(grandparent, parent): break
+			parent = grandparent
+	return parent
+
+def label_runs(mask, connectivity: int = 8) -> tuple:
+	"""Returns the runs of a mask (see runs) and the component of every run, numbered from 0, with the component count."""
+	rows, starts, ends = runs(mask)
+	if not len(rows): return (rows, starts, ends, rows, 0)
+
+	# runs touch the ones on the next row that overlap them (or touch them diagonally, with 8-connectivity)
+	stride = mask.shape[1] + 2
+	c = 1 if connectivity == 8 else 0
+	g_starts, g_ends = (rows * stride + starts, rows * stride + ends)
+	lo = np.searchsorted(g_ends, g_starts + stride - c, side="right")
+	hi = np.searchsorted(g_starts, g_ends + stride + c, side="left")
+	counts = np.maximum(hi - lo, 0)
+	a = np.repeat(np.arange(len(rows)), counts)
+	b = np.repeat(lo, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+	roots = union_find(len(rows), a, b)
+	_, components = np.unique(roots, return_inverse=True)
+	return (rows, starts, ends, components, int(components.max()) + 1)
+
+def label(mask, connectivity: int = 8) -> tuple:
+	"""Returns (labels, count) of a 2-D mask's connected components, labels 1 to count and 0 for the background."""
+	rows, starts, ends, components, count = label_runs(mask, connectivity)
+	labels = np.zeros(mask.shape, dtype=np.int32)
+	lengths = ends - starts
+	offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+	labels.ravel()[np.repeat(rows * mask.shape[1] + starts, lengths) + offsets] = np.repeat(components + 1, lengths)
+	return (labels, count)
+
+def extract(scores, threshold: float = None, min_area: int = 16, bg_margin: int = 10, offset: tuple = (0, 0), connectivity: int = 8, rank: str = "mass", count: int = None, mode: str = "TOPLEFT") -> list:
+	"""Returns the blobs of a likelihood map over a threshold, best first.
+
+	The map can be the 8-bit output of likelihood_image (a PIL image or array, gray or with equal
+	channels) or float weights. The threshold defaults to positive evidence: over 128 for 8-bit
+	maps, over 0 otherwise. Blobs smaller than min_area pixels are left out, the others are ranked
+	by "mass" (area times mean score), "score" or "area". Boxes are moved by (x, y) <offset>, e.g.
+	a search window's top left corner, so they're in frame coordinates."""
+	scores = np.asarray(scores)
+	if scores.ndim == 3:
+		if (scores != scores[..., :1]).any(): raise Exception("Likelihood maps need a single channel")
+		scores = scores[..., 0]
+	if threshold is None: threshold = 128 if scores.dtype == np.uint8 else 0
+	rows, starts, ends, components, n = label_runs(scores > threshold, connectivity)
+	if not n: return []
+
+	# sum the scores of every run from a running sum along the rows
+	sums = np.zeros((scores.shape[0], scores.shape[1] + 1))
+	np.cumsum(scores, axis=1, out=sums[:, 1:])
+	run_sums = sums[rows, ends] - sums[rows, starts]
+
+	area = np.bincount(components, ends - starts, n)
+	total = np.bincount(components, run_sums, n)
+	x1 = np.full(n, scores.shape[1]); np.minimum.at(x1, components, starts)
+	x2 = np.zeros(n, dtype=int); np.maximum.at(x2, components, ends)
+	y1 = np.full(n, scores.shape[0]); np.minimum.at(y1, components, rows)
+	y2 = np.zeros(n, dtype=int); np.maximum.at(y2, components, rows + 1)
+
+	keep = np.nonzero(area >= min_area)[0]
+	mean = total[keep] / area[keep]
+	key = {"mass": total[keep], "score": mean, "area": area[keep]}[rank]
+	order = keep[np.argsort(-key, kind="stable")][:count]
+	ox, oy = offset
+	return [Blob((int(x1[i] + ox), int(y1[i] + oy), int(x2[i] + ox), int(y2[i] + oy)), int(area[i]), float(total[i] / area[i]), bg_margin, mode) for i in order]
+
+def candidates(image, tracker: Tracker, mode: str = "RGB", color_count: int = 64, window: tuple = None, **kwargs) -> list:
+	"""Returns the blobs of an image that look like a tracker's target, for re-detection or seeding trackers.
+
+	The model is learned from the tracker, the map is computed over the (x1, y1, x2, y2) window,
+	the whole frame by default. Keyword arguments go to extract."""
+	from util import image_to_array, quantize, region_counts, log_likelihood_ratios, likelihood_table, constrain_box
+	image = image_to_array(image)
+	h, w = image.shape[:2]
+	x1, y1, x2, y2 = constrain_box(window or (0, 0, w, h), w, h)
+	img = quantize(image, mode, color_count)
+	table = likelihood_table(log_likelihood_ratios(*region_counts(img, tracker, color_count)))
+	kwargs.setdefault("bg_margin", tracker.bg_margin)
+	return extract(table[img[y1:y2, x1:x2]], offset=(x1, y1), **kwargs)
+
+def redetect(weights, tracker: Tracker, min_area: int = 16) -> Tracker:
+	"""Returns the tracker centered on the blob of positive weights with the most mass, unchanged if there's none."""
+	from tracking import move_center
+	found = extract(weights, 0, min_area, count=1)
+	if not found: return tracker
+	x1, y1, x2, y2 = found[0].box
+	return move_center(tracker, (x1 + x2) / 2, (y1 + y2) / 2)
@@ -0,0 +1,48 @@
+import numpy as np
+
+def downsample(frame, factor: int):
+	"""Returns a float32 greyscale frame downsampled by averaging factor*factor blocks."""
+	from util import image_to_array
+	frame = image_to_array(frame)
+	h, w = (frame.shape[0] // factor * factor, frame.shape[1] // factor * factor)
+	grey = frame[:h, :w].astype(np.float32).mean(2) if frame.ndim == 3 else frame[:h, :w].astype(np.float32)
+	return grey.reshape(h // factor, factor, w // factor, factor).mean((1, 3))
+
+def phase_correlation(a, b) -> tuple:
+	"""Returns the shift (dx, dy) that moves greyscale frame a onto frame b, found with FFT phase correlation."""
+	window = np.outer(np.hanning(a.shape[0]), np.hanning(a.shape[1])).astype(np.float32)
+	A = np.fft.rfft2((a - a.mean()) * window)
+	B = np.fft.rfft2((b - b.mean()) * window)
+
+	# the normalized cross-power spectrum has a single peak at the shift
+	R = B * np.conj(A)
+	R /= np.maximum(np.abs(R), 1e-9)
+	r = np.fft.irfft2(R, s=a.shape)
+	y, x = np.unravel_index(np.argmax(r), r.shape)
+
+	# refine the peak with a parabola through its neighbours
+	def refine(m, p, n):
+		d = m - 2 * p + n
+		return 0.5 * (m - n) / d if d else 0
+	h, w = r.shape
+	fx = x + refine(r[y, (x - 1) % w], r[y, x], r[y, (x + 1) % w])
+	fy = y + refine(r[(y - 1) % h, x], r[y, x], r[(y + 1) % h, x])
+
+	# shifts past the middle wrap around to negative ones
+	if fx > w / 2: fx -= w
+	if fy > h / 2: fy -= h
+	return (float(fx), float(fy))
+
+class CameraMotion:
+	"""Estimates the global frame-to-frame shift of a sequence, once per frame for all trackers."""
+	def __init__(self, factor: int = 4) -> None:
+		self.factor = factor
+		self.previous = None
+
+	def update(self, frame) -> tuple:
+		"""Returns the shift (dx, dy) of the frame against the previous one, in full resolution pixels."""
+		current = downsample(frame, self.factor)
+		previous, self.previous = (self.previous, current)
+		if previous is None or previous.shape != current.shape: return (0, 0)
+		dx, dy = phase_correlation(previous, current)
+		return (dx * self.factor, dy * self.factor)
@@ -0,0 +1,163 @@
+import json
+import os
+import numpy as np
+
+def checkpoint_path(out_path: str) -> str:
+	"""Returns the path of the checkpoint kept next to a trajectory file."""
+	return out_path + ".ckpt.npz"
+
+def follower_state(follower, prefix: str) -> dict:
+	"""Returns the state of a follower as {name: array}, names starting with <prefix>."""
+	from quantizer import Quantizer
+	tracker, model = (follower.tracker, follower.model)
+	meta = {
+		"tracker":    [tracker.x, tracker.y, tracker.width, tracker.height, tracker.bg_margin, tracker.mode],
+		"frame":      follower.frame,
+		"iterations": follower.iterations,
+		"epsilon":    follower.epsilon,
+		"use_motion": follower.use_motion,
+		"smoothing":  follower.smoothing,
+		"model":      [model.mode, model.color_count, model.kernel],
+		"quantizer":  model.quantizer if model.quantizer is None or isinstance(model.quantizer, str) else model.quantizer.bits,
+		"monitor":    vars(follower.monitor),
+		"sparse":     model.sparse,
+	}
+	state = {}
+	if isinstance(model.quantizer, Quantizer): state["lut"] = model.quantizer.lut
+	if model.ratios is not None:
+		if model.sparse:
+			state.update(fg_ids=model.fg_count.ids, fg_counts=model.fg_count.counts, bg_ids=model.bg_count.ids, bg_counts=model.bg_count.counts, ratio_ids=model.ratios.ids, ratios=model.ratios.values)
+		else:
+			state.update(fg_counts=model.fg_count, bg_counts=model.bg_count, ratios=model.ratios)
+	if follower.motion:
+		meta["motion"] = [follower.motion.sigmas, follower.motion.min_margin, follower.motion.max_margin]
+		state.update(motion_state=follower.motion.state, motion_covariance=follower.motion.covariance, motion_process=follower.motion.process, motion_measurement=follower.motion.measurement)
+	state["meta"] = np.array(json.dumps(meta))
+	return {prefix + name: value for name, value in state.items()}
+
+def restore_follower(state: dict, prefix: str):
+	"""Returns the follower saved by follower_state under <prefix>."""
+	from tracker import Tracker
+	from tracking import Follower
+	from quantizer import Quantizer
+	state = {name[len(prefix):]: value for name, value in state.items() if name.startswith(prefix)}
+	meta = json.loads(str(state["meta"]))
+	x, y, w, h, bg_margin, mode = meta["tracker"]
+	model_mode, color_count, kernel = meta["model"]
+	quantizer = meta["quantizer"]
+	if "lut" in state: quantizer = Quantizer(state["lut"], quantizer)
+
+	follower = Follower(Tracker(x, y, w, h, bg_margin=bg_margin, mode=mode), model_mode, color_count, meta["iterations"], meta["epsilon"], kernel=kernel, motion=meta["use_motion"], quantizer=quantizer, smoothing=meta.get("smoothing"))
+	follower.frame = meta["frame"]
+	vars(follower.monitor).update(meta["monitor"])
+
+	model = follower.model
+	if "ratios" in state:
+		if meta["sparse"]:
+			from sparse import SparseHistogram, SparseTable
+			model.fg_count = SparseHistogram(state["fg_ids"], state["fg_counts"])
+			model.bg_count = SparseHistogram(state["bg_ids"], state["bg_counts"])
+			model.ratios = SparseTable(state["ratio_ids"], state["ratios"])
+		else:
+			model.fg_count, model.bg_count, model.ratios = (state["fg_counts"], state["bg_counts"], state["ratios"])
+	if "motion" in meta:
+		from motion import MotionModel
+		sigmas, min_margin, max_margin = meta["motion"]
+		follower.motion = MotionModel(0, 0, sigmas=sigmas, min_margin=min_margin, max_margin=max_margin)
+		follower.motion.state, follower.motion.covariance = (state["motion_state"], state["motion_covariance"])
+		follower.motion.process, follower.motion.measurement = (state["motion_process"], state["motion_measurement"])
+	return follower
+
+def save(path: str, followers: list, frame: int) -> None:
+	"""Writes the state of the followers after <frame> frames to a checkpoint, atomically."""
+	state = {"frame": np.array(frame), "count": np.array(len(followers))}
+	for i, follower in enumerate(followers):
+		state.update(follower_state(follower, "%d/" % i))
+
+	# write to a temporary file first so a crash never leaves a half-written checkpoint
+	tmp = path + ".%d.tmp" % os.getpid()
+	with open(tmp, "wb") as file:
+		np.savez(file, **state)
+		file.flush()
+		os.fsync(file.fileno())
+	os.replace(tmp, path)
+
+def load(path: str) -> tuple:
+	"""Returns (followers, frames done) of a checkpoint."""
+	with np.load(path) as data:
+		state = dict(data)
+	return ([restore_follower(state, "%d/" % i) for i in range(int(state["count"]))], int(state["frame"]))
+
+def read_trajectory(path: str) -> list:
+	"""Returns the rows of a trajectory file, one list of floats per frame."""
+	with open(path, "r") as file:
+		return [[float(v) for v in line.split(",")] for line in file if line.strip()]
+
+def track_sequence(path: str, out_path: str, trackers: list = None, every: int = 100, resume: bool = False, bg_margin: int = 20, cache = None, writer = None, **kwargs) -> int:
+	"""Tracks through a sequence, writing a row of (x, y, w, h) per tracker per frame to <out_path> as it goes.
+
+	The trackers default to the first ground truth box. Every <every> frames the followers are
+	checkpointed next to the trajectory. With resume=True the run continues from the checkpoint,
+	if there is one, reading the sequence from the checkpointed frame on. Frames are also handed
+	to a writer.FrameWriter if one is given. Returns the frame count."""
+	from sequence import Sequence
+	from tracker import Tracker
+	from tracking import Follower
+	sequence = Sequence(path, cache)
+	checkpoint = checkpoint_path(out_path)
+
+	if resume and os.path.exists(checkpoint):
+		followers, done = load(checkpoint)
+		# frames tracked after the checkpoint are tracked again
+		rows = read_trajectory(out_path)[:done] if os.path.exists(out_path) else []
+		if len(rows) < done: raise Exception(f"Trajectory {out_path} is shorter than its checkpoint")
+		with open(out_path, "w") as file:
+			file.writelines(",".join("%g" % v for v in row) + "\n" for row in rows)
+	else:
+		if trackers is None:
+			x, y, w, h = sequence.boxes[0]
+			trackers = [Tracker(x, y, w, h, bg_margin=bg_margin, mode="TOPLEFT")]
+		followers = [Follower(tracker, **kwargs) for tracker in trackers]
+		done = 0
+		open(out_path, "w").close()
+
+	sequence.seek(done)
+	if writer: writer.index = done
+	with open(out_path, "a") as file:
+		for frame in sequence:
+			trackers = [follower.start(frame) if follower.frame == 0 else follower.step(frame) for follower in followers]
+			if writer: writer.write(frame, trackers)
+			row = []
+			for tracker in trackers:
+				x1, y1, x2, y2 = tracker.fg_coords()
+				row += [x1, y1, x2 - x1, y2 - y1]
+			file.write(",".join("%g" % v for v in row) + "\n")
+			done += 1
+			if done % every == 0:
+				# the trajectory has to be on disk before a checkpoint points past it
+				file.flush()
+				os.fsync(file.fileno())
+				save(checkpoint, followers, done)
+	return done
+
+if __name__ == "__main__":
+	import argparse
+	parser = argparse.ArgumentParser(description="Track through a long sequence with periodic checkpoints.")
+	parser.add_argument("sequence", help="directory of frames with a groundtruth.txt")
+	parser.add_argument("--out", required=True, help="trajectory file, the checkpoint is written next to it")
+	parser.add_argument("--every", type=int, default=100, help="frames between checkpoints")
+	parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+	parser.add_argument("--bg-margin", type=int, default=20)
+	parser.add_argument("--color-count", type=int, default=64)
+	parser.add_argument("--mode", default="RGB")
+	parser.add_argument("--motion", action="store_true")
+	parser.add_argument("--render", default=None, help="directory to write the annotated frames to")
+	args = parser.parse_args()
+
+	from writer import FrameWriter
+	writer = FrameWriter(args.render) if args.render else None
+	try:
+		frames = track_sequence(args.sequence, args.out, every=args.every, resume=args.resume, bg_margin=args.bg_margin, color_count=args.color_count, mode=args.mode, motion=args.motion, writer=writer)
+	finally:
+		if writer: writer.close()
+	print(f"tracked {frames} frames, wrote {args.out}")
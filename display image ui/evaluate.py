@@ -0,0 +1,102 @@
+import os
+import numpy as np
+
+SUCCESS_THRESHOLDS   = np.linspace(0, 1, 21)
+PRECISION_THRESHOLDS = np.arange(0, 51)
+
+def iou(a, b):
+	"""Returns the intersection over union of every pair of (x, y, w, h) boxes in two (N, 4) arrays."""
+	a, b = (np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+	w = np.maximum(np.minimum(a[:, 0] + a[:, 2], b[:, 0] + b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0)
+	h = np.maximum(np.minimum(a[:, 1] + a[:, 3], b[:, 1] + b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0)
+	intersection = w * h
+	union = a[:, 2] * a[:, 3] + b[:, 2] * b[:, 3] - intersection
+	return intersection / np.maximum(union, 1e-9)
+
+def center_error(a, b):
+	"""Returns the distance between the centers of every pair of (x, y, w, h) boxes in two (N, 4) arrays."""
+	a, b = (np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+	return np.hypot(a[:, 0] + a[:, 2] / 2 - b[:, 0] - b[:, 2] / 2, a[:, 1] + a[:, 3] / 2 - b[:, 1] - b[:, 3] / 2)
+
+def success_curve(ious, thresholds = SUCCESS_THRESHOLDS):
+	"""Returns the fraction of frames whose IoU is over each threshold."""
+	return (np.asarray(ious)[None, :] > np.asarray(thresholds)[:, None]).mean(1)
+
+def precision_curve(errors, thresholds = PRECISION_THRESHOLDS):
+	"""Returns the fraction of frames whose center error is within each threshold (in pixels)."""
+	return (np.asarray(errors)[None, :] <= np.asarray(thresholds)[:, None]).mean(1)
+
+def evaluate_sequence(path: str, bg_margin: int = 20, cache_root: str = None, **kwargs) -> dict:
+	"""Tracks the first ground truth box through a sequence and returns its per-frame and summary results."""
+	from time import perf_counter
+	from framecache import FrameCache
+	from sequence import Sequence, tracker_box
+	from tracker import Tracker
+	from tracking import Follower
+
+	sequence = Sequence(path, FrameCache(cache_root) if cache_root else None)
+	if not sequence.boxes: raise Exception(f"Sequence {path} has no ground truth")
+	x, y, w, h = sequence.boxes[0]
+	follower = Follower(Tracker(x, y, w, h, bg_margin=bg_margin, mode="TOPLEFT"), **kwargs)
+
+	# only the tracking itself is timed, not the decoding
+	boxes = []
+	elapsed = 0
+	for i, frame in enumerate(sequence):
+		if i >= len(sequence.boxes): break
+		start = perf_counter()
+		tracker = follower.start(frame) if i == 0 else follower.step(frame)
+		elapsed += perf_counter() - start
+		boxes.append(tracker_box(tracker))
+
+	ground_truth = sequence.boxes[:len(boxes)]
+	ious = iou(boxes, ground_truth)
+	errors = center_error(boxes, ground_truth)
+	success = success_curve(ious)
+	precision = precision_curve(errors)
+	return {
+		"sequence":     path,
+		"frames":       len(boxes),
+		"boxes":        boxes,
+		"iou":          ious,
+		"center_error": errors,
+		"success":      success,
+		"precision":    precision,
+		"success_auc":  float(success.mean()),
+		"precision_20": float(precision[20]),
+		"fps":          len(boxes) / elapsed if elapsed else float("inf"),
+	}
+
+def evaluate(paths: list, workers: int = None, **kwargs) -> list:
+	"""Evaluates many sequences in parallel and returns their results in order."""
+	from concurrent.futures import ProcessPoolExecutor
+	from functools import partial
+	with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+		return list(pool.map(partial(evaluate_sequence, **kwargs), paths))
+
+def report(results: list) -> str:
+	"""Returns a text table summarizing the results."""
+	lines = ["%-40s %7s %8s %8s %8s %9s" % ("sequence", "frames", "mean iou", "success", "prec@20", "fps")]
+	for r in results:
+		lines.append("%-40s %7d %8.3f %8.3f %8.3f %9.1f" % (os.path.basename(os.path.normpath(r["sequence"]))[:40], r["frames"], r["iou"].mean(), r["success_auc"], r["precision_20"], r["fps"]))
+	return "\n".join(lines)
+
+if __name__ == "__main__":
+	import argparse
+	parser = argparse.ArgumentParser(description="Evaluate the tracker against ground truth sequences.")
+	parser.add_argument("sequences", nargs="+", help="directories of frames with a groundtruth.txt")
+	parser.add_argument("--bg-margin", type=int, default=20)
+	parser.add_argument("--color-count", type=int, default=64)
+	parser.add_argument("--mode", default="RGB")
+	parser.add_argument("--motion", action="store_true")
+	parser.add_argument("--workers", type=int, default=None)
+	parser.add_argument("--out", default=None, help="directory to write the tracked boxes to")
+	args = parser.parse_args()
+
+	results = evaluate(args.sequences, args.workers, bg_margin=args.bg_margin, color_count=args.color_count, mode=args.mode, motion=args.motion)
+	print(report(results))
+	if args.out:
+		from sequence import write_boxes
+		os.makedirs(args.out, exist_ok=True)
+		for r in results:
+			write_boxes(os.path.join(args.out, os.path.basename(os.path.normpath(r["sequence"])) + ".txt"), r["boxes"])
@@ -0,0 +1,60 @@
+import os
+import numpy as np
+
+__location__ = __file__[:__file__.rfind("/")+1]
+
+class FrameCache:
+	"""On-disk cache of decoded frames, stored as .npy files and opened memory-mapped.
+
+	Entries are keyed by the source path, its modification time and its size, so an edited
+	file is decoded again while an unchanged one is never decoded twice."""
+	def __init__(self, root: str = None) -> None:
+		self.root = root or __location__ + ".framecache/"
+		os.makedirs(self.root, exist_ok=True)
+
+	def key(self, path: str, *extra) -> str:
+		"""Returns the cache key of a source file (plus any extra parameters)."""
+		from hashlib import sha1
+		path = os.path.abspath(path)
+		stat = os.stat(path)
+		return sha1(":".join(str(x) for x in (path, stat.st_mtime_ns, stat.st_size) + extra).encode()).hexdigest()
+
+	def _load(self, name: str, create):
+		"""Returns the memory-mapped entry <name>, creating it with create(path) if it's missing."""
+		path = self.root + name + ".npy"
+		if not os.path.exists(path):
+			# write to a temporary file first so other processes never see a half-written entry
+			tmp = path + ".%d.tmp" % os.getpid()
+			create(tmp)
+			os.replace(tmp, path)
+		return np.load(path, mmap_mode="r")
+
+	def rgb(self, path: str):
+		"""Returns the decoded (height, width, 3) uint8 RGB frame of an image file."""
+		def create(tmp):
+			from PIL import Image
+			image = Image.open(path).convert("RGB")
+			with open(tmp, "wb") as file:
+				np.save(file, np.asarray(image))
+		return self._load(self.key(path), create)
+
+	def quantized(self, path: str, mode: str = "RGB", color_count: int = 64):
+		"""Returns the quantized (height, width) plane of an image file, as computed by util.quantize."""
+		from util import quantize
+		def create(tmp):
+			plane = quantize(self.rgb(path), mode, color_count).astype(np.uint8 if color_count < 256 else np.uint16)
+			with open(tmp, "wb") as file:
+				np.save(file, plane)
+		return self._load(self.key(path, mode, color_count), create)
+
+	def clear(self) -> None:
+		"""Deletes every cached frame."""
+		for name in os.listdir(self.root):
+			if name.endswith(".npy"): os.remove(self.root + name)
+
+def load_frame(path: str, cache: FrameCache = None):
+	"""Returns the RGB array of an image file, read from the frame cache if one is given."""
+	if cache: return cache.rgb(path)
+	from util import image_to_array
+	from PIL import Image
+	return image_to_array(Image.open(path))
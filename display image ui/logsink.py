@@ -0,0 +1,64 @@
+from collections import deque
+from threading import Lock, get_ident
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+class LogSink:
+	"""Bounded ring buffer of log messages, written from any thread and drained in batches.
+
+	Messages under the sink's level, or lines not containing its filter text, are dropped on write, so
+	disabled diagnostics only cost a comparison. When the buffer is full the oldest messages go."""
+	def __init__(self, capacity: int = 2000, level: str = "INFO", pattern: str = "") -> None:
+		self.messages = deque(maxlen=capacity)
+		self.lock = Lock()
+		self.dropped = 0
+		self.set_level(level)
+		self.set_filter(pattern)
+
+	def set_level(self, level: str) -> None:
+		self.level = LEVELS[level.upper()]
+
+	def set_filter(self, pattern: str) -> None:
+		"""Only keep lines containing the pattern (all messages if it's empty)."""
+		self.pattern = pattern
+		self.partial = {} # unfinished line of every (thread, level)
+
+	def enabled(self, level: str) -> bool:
+		return LEVELS[level] >= self.level
+
+	def write(self, string: str, level: str = "INFO") -> None:
+		if LEVELS[level] < self.level: return
+		with self.lock:
+			if self.pattern:
+				# filter whole lines, print() writes the text and its newline separately
+				key = (get_ident(), level)
+				lines = (self.partial.pop(key, "") + string).split("\n")
+				if lines[-1]: self.partial[key] = lines[-1]
+				string = "".join(line + "\n" for line in lines[:-1] if self.pattern in line)
+				if not string: return
+			if len(self.messages) == self.messages.maxlen: self.dropped += 1
+			self.messages.append((level, string))
+
+	def drain(self) -> list:
+		"""Returns and removes every buffered (level, message) pair."""
+		with self.lock:
+			messages = list(self.messages)
+			self.messages.clear()
+		return messages
+
+sink = LogSink()
+
+def log(message: str, level: str = "INFO") -> None:
+	sink.write(message + "\n", level)
+
+def debug(message: str) -> None:
+	if sink.enabled("DEBUG"): sink.write(message + "\n", "DEBUG")
+
+def info(message: str) -> None:
+	log(message, "INFO")
+
+def warning(message: str) -> None:
+	log(message, "WARNING")
+
+def error(message: str) -> None:
+	log(message, "ERROR")
@@ -2,13 +2,22 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from tkinter.scrolledtext import ScrolledText
 from tracker import Tracker
+from framecache import FrameCache
+from spatial import GridIndex
+from tileview import SceneCanvas, TileLayer, TileViewer
 from PIL import Image, ImageTk
 
 class Console(ScrolledText):
-	def __init__(self, *args, **kwargs) -> None:
+	def __init__(self, *args, sink=None, max_lines: int = 1000, interval: int = 100, **kwargs) -> None:
 		import sys
+		import logsink
 		super().__init__(*args, **kwargs)
-		self.ch_count = 0
+		self.sink = sink or logsink.sink
+		self.max_lines = max_lines
+		self.interval = interval
+		self.tag_config("DEBUG", foreground="#9a9a9a")
+		self.tag_config("WARNING", foreground="#f0c040")
+		self.tag_config("ERROR", foreground="#f05050")
 
 		class ConsoleManager:
 			def __init__(self, widget: tk.Text, old_stdout: sys.stdout):
@@ -16,24 +25,35 @@ class Console(ScrolledText):
 				self.old_stdout = old_stdout
 				
 			def write(self, string):
-				from datetime import datetime
-
-				if self.console.ch_count > 1000:
-					self.console.ch_count -= 500
-					self.console.delete("1.0", "499.0")
-
 				# write to default console
 				self.old_stdout.write(string)
 
-				# write to text widget
-				self.console.insert('end', string)
-				self.console.see('end')
-				self.console.ch_count += 1
+				# buffer for the text widget, it's written on the next flush
+				self.console.sink.write(string)
 
 			def flush(*a, **kw):
 				pass
 
 		sys.stdout = ConsoleManager(self, sys.stdout)
+		self.after(self.interval, self.flush)
+
+	def flush(self):
+		"""Writes the buffered messages to the widget in one go (runs on a timer)."""
+		messages = self.sink.drain()
+		if messages:
+			# insert consecutive messages of the same level as one chunk
+			chunks = []
+			for level, string in messages:
+				if chunks and chunks[-1][0] == level: chunks[-1][1].append(string)
+				else: chunks.append((level, [string]))
+			for level, strings in chunks:
+				self.insert("end", "".join(strings), level)
+
+			# only keep the last <max_lines> lines
+			lines = int(self.index("end-1c").split(".")[0])
+			if lines > self.max_lines: self.delete("1.0", "%d.0" % (lines - self.max_lines + 1))
+			self.see("end")
+		self.after(self.interval, self.flush)
 
 class InfoText(tk.Label):
 	def __init__(self, *args, **kwargs) -> None:
@@ -271,10 +291,11 @@ class TransformManager:
 		# update the center marker to be in the middle
 		cx = round(rx1+(rx2-rx1)/2)
 		cy = round(ry1+(ry2-ry1)/2)
-		canvas.coords(self.center_marker[0], cx-3, cy,   cx+4, cy)
-		canvas.coords(self.center_marker[1], cx,   cy-3, cx,   cy+4)
+		m = 1 / canvas.zoom
+		canvas.coords(self.center_marker[0], cx-3*m, cy,     cx+4*m, cy)
+		canvas.coords(self.center_marker[1], cx,     cy-3*m, cx,     cy+4*m)
 
-		w = 7 # handle size
+		w = 7 / canvas.zoom # handle size, the same on screen at any zoom
 		for i in range(9):
 			if i == 4: continue
 			# if show_handles is false, hide the handles
@@ -327,11 +348,11 @@ class TransformManager:
 			self.x1 = ((self.x2 + x) - (y - self.y1) * self.ratio) / 2 if mode.fixed else x
 			self.y2 = ((self.y1 + y) + (self.x2 - x) / self.ratio) / 2 if mode.fixed else y
 		if "move" == mode.state:
-			cs = 15 # center size
+			cs = 15 / canvas.zoom # center size
 			w = self.x2 - self.x1
 			h = self.y2 - self.y1
 			tc = (x - self.ox + w / 2, y - self.oy + h / 2) # transform center
-			cc = (canvas.winfo_width()/2, canvas.winfo_height()/2) # canvas center
+			cc = canvas.to_scene(canvas.winfo_width()/2, canvas.winfo_height()/2) # view center
 			if mode.fixed and tc[0] >= cc[0] - cs and tc[0] <= cc[0] + cs:
 				x = cc[0] + self.ox - w/2
 			if mode.fixed and tc[1] >= cc[1] - cs and tc[1] <= cc[1] + cs:
@@ -365,21 +386,16 @@ class TransformManager:
 		if y1 > y2: y2 = y2 + y1; y1 = y2 - y1; y2 = y2 - y1
 		return (int(x1), int(y1), int(x2), int(y2))
 
-images = []
+layers = {} # canvas tag -> TileLayer of every image on the canvas
 def choose_image():
-	from PIL import Image, ImageTk
 	from tkinter import filedialog
 	filepath = filedialog.askopenfilename(initialdir=__location__+"src", title="Load an image", filetypes=(("Image files", ("*.png", "*.gif*", "*.jpg", "*.jpeg")), ("All files", ("*.*"))))
 	if not filepath: return
-	images.append(ImageTk.PhotoImage(Image.open(filepath)))
-	return (images[-1], filepath)
+	return create_image(filepath)
 
 def create_image(filepath):
-	from PIL import Image, ImageTk
-	from tkinter import filedialog
 	if not filepath: return
-	images.append(ImageTk.PhotoImage(Image.open(filepath)))
-	return (images[-1], filepath)
+	return (TileLayer.from_file(filepath, frame_cache), filepath)
 
 def choose_name(root: tk.Tk, text: str = "Enter a name:"):
 	w, h, wx, wy, ww, wh = (300, 100, root.winfo_x(), root.winfo_y(), root.winfo_width(), root.winfo_height())
@@ -496,21 +512,17 @@ def choose_scene(root: tk.Tk, scenes: dict):
 	return string_var.get()
 
 def display_image(root: tk.Tk, image: Image):
-	w, h, wx, wy, ww, wh = (image.width, image.height, root.winfo_x(), root.winfo_y(), root.winfo_width(), root.winfo_height())
+	w, h, wx, wy, ww, wh = (min(image.width, 800), min(image.height, 600), root.winfo_x(), root.winfo_y(), root.winfo_width(), root.winfo_height())
 	new_window = tk.Toplevel(root)
 	new_window.geometry("%dx%d+%d+%d" % (w, h, wx + (ww - w) //2, wy + (wh - h) // 2))
-	new_window.resizable(0, 0)
 	new_window.title("Image")
 	new_window.focus_force()
 	new_window.grab_set()
 
-	canvas = tk.Canvas(new_window, bg="white", bd=-2)
+	# drag to pan, scroll to zoom
+	canvas = TileViewer(new_window, image, bg="white", bd=-2)
 	canvas.pack(fill="both", expand=1)
 
-	global img
-	img = ImageTk.PhotoImage(image)
-	canvas.create_image(0, 0, image=img, anchor="nw")
-
 	def window_exit(*a, **k):
 		new_window.quit()
 		new_window.destroy()
@@ -524,6 +536,14 @@ def display_image(root: tk.Tk, image: Image):
 __location__ = __file__[:__file__.rfind("/")+1]
 __scene_file__ = "objects.json"
 objects = []
+object_index = GridIndex() # bounding boxes of <objects>, for hit-testing
+frame_cache = FrameCache()
+
+def object_box(o, canvas: tk.Canvas = None) -> tuple:
+	"""Returns the bounding box (x1, y1, x2, y2) of an object from the <objects> list."""
+	if isinstance(o, Tracker): return (o.x, o.y, o.x+o.width, o.y+o.height)
+	if isinstance(o, tuple): return tuple(o[2:])
+	if isinstance(o, int): return tuple(canvas.coords(o))
 
 class UI(tk.Frame):
 	def __init__(self, root: tk.Tk, *args, **kwargs):
@@ -727,6 +747,7 @@ class UI(tk.Frame):
 			name = obj_name.split("_")[0]
 			if name.lower() == "tracker":
 				objects.append(Tracker(values["x"], values["y"], values["width"], values["height"], bg_margin=values["bg_margin"], mode=values["mode"]))
+				object_index.insert(objects[-1], object_box(objects[-1]))
 				objects[-1].tk_draw(self.canvas)
 			if name.lower() == "image":
 				self.load_image_to_canvas(create_image(values["file"].replace("$", __location__)), values["x1"], values["y1"])
@@ -773,13 +794,14 @@ class UI(tk.Frame):
 
 	def calculate_likelihood(self):
 		from util import likelihood_image
+		from framecache import load_frame
 		self.deselect_object()
 
 		tracker = ([x for x in objects if type(x) is Tracker] or [None])[0]
 		img = ([x for x in objects if type(x) is tuple] or [None])[0]
 		if img is None or tracker is None: return messagebox.showerror("Cannot calculate likelihood", "Not enough info")
 
-		image = Image.open(img[1])
+		image = load_frame(img[1], frame_cache)
 		tracker = tracker.offset(img[2], img[3])
 		
 		display_image(self.root, likelihood_image(image, tracker))
@@ -789,10 +811,16 @@ class UI(tk.Frame):
 		"""Load and display an image to canvas."""
 		if not img: img = choose_image()
 		if not img: return
-		img, filepath = img
-		img_id = self.canvas.create_image(x1 or self.canvas.winfo_width()/2 - img.width() / 2, y1 or self.canvas.winfo_height()/2 - img.height() / 2, image=img, anchor="nw")
-		x, y = self.canvas.coords(img_id)
-		objects.append((img_id, filepath, x, y, x+img.width(), y+img.height()))
+		layer, filepath = img
+		cx, cy = self.canvas.to_scene(self.canvas.winfo_width()/2, self.canvas.winfo_height()/2)
+		x = x1 if x1 is not None else cx - layer.width / 2
+		y = y1 if y1 is not None else cy - layer.height / 2
+		# only the tiles visible on the canvas are decoded and kept in memory
+		self.canvas.place_layer(layer, x, y)
+		layers[layer.tag] = layer
+		img_id = layer.tag
+		objects.append((img_id, filepath, x, y, x+layer.width, y+layer.height))
+		object_index.insert(objects[-1], object_box(objects[-1]))
 		self.canvas.tag_lower(img_id)
 		self.scene_changed.set(True)
 
@@ -812,10 +840,11 @@ class UI(tk.Frame):
 		"""Deletes the selected object."""
 		if not obj: obj = self.transform_object.object
 		if obj in objects: objects.remove(obj)
+		object_index.remove(obj)
 		if isinstance(obj, Tracker):
 			obj.tk_undraw(self.canvas)
 		elif isinstance(obj, tuple):
-			self.canvas.delete(obj[0])
+			if obj[0] in layers: layers.pop(obj[0]).delete(self.canvas)
 		elif isinstance(obj, int):
 			self.canvas.delete(obj)
 		self.reset_transform()
@@ -825,9 +854,11 @@ class UI(tk.Frame):
 		if isinstance(self.transform_object.object, Tracker):
 			self.transform_object.object.tk_draw(self.canvas)
 			objects.insert(0, self.transform_object.object)
+			object_index.insert(objects[0], object_box(objects[0]), front=True)
 		elif isinstance(self.transform_object.object, tuple):
 			obj = self.transform_object.object
 			objects.append((obj[0],obj[1]) + self.canvas_transform.coords())
+			object_index.insert(objects[-1], object_box(objects[-1]))
 		self.reset_transform()
 	
 	def display_object_properties(self, object_):
@@ -859,8 +890,9 @@ class UI(tk.Frame):
 
 	def setup_canvas(self, parent: tk.Widget):
 		def coords(event):
-			"""Get X and Y coordinates from a mouse event."""
-			return (int(event.x), int(event.y))
+			"""Get the scene X and Y coordinates of a mouse event."""
+			x, y = self.canvas.to_scene(event.x, event.y)
+			return (int(x), int(y))
 		
 		def point_intersects_square_center_xyw(x, y, square_x, square_y, square_rad):
 			"""Returns whether a point (x, y) intersects with a given square centered at (x=square_x, y=square_y, w=square_rad, h=square rad)"""
@@ -876,7 +908,7 @@ class UI(tk.Frame):
 
 		def set_transform_mode(x, y):
 			"""Set transforming mode based on which handle the user grabbed."""
-			select_rad = 10
+			select_rad = 10 / self.canvas.zoom
 			handles = self.canvas_transform.show_handles
 			fixed_r = self.canvas_transform.fixed_radtio
 			x1, y1, x2, y2 = self.canvas_transform.coords()
@@ -903,23 +935,17 @@ class UI(tk.Frame):
 
 		def select_object(x, y):
 			global objects
-			for i, o in enumerate(objects):
-				x1, y1, x2, y2 = (None,) * 4
-				self.canvas_transform.show_handles = True
-				if isinstance(o, Tracker):
-					x1, y1, x2, y2 = (o.x, o.y, o.x+o.width, o.y+o.height)
-				elif isinstance(o, tuple):
-					x1, y1, x2, y2 = o[2:]
-					self.canvas_transform.show_handles = False
-				elif isinstance(o, int):
-					x1, y1, x2, y2 = self.canvas.coords(o)
-				if point_intersects_rect_xyxy(x, y, x1, y1, x2, y2):
-					objects.pop(i) # remove it from <objects> list
-					self.transform_object.set(o)
-					self.canvas_transform.create(self.canvas, x1, y1, x2, y2)
-					self.transform_state.set(True)
-					return
-			self.transform_object.set(None)
+			# only the objects in the grid cell under the cursor are checked
+			hits = object_index.query(x, y)
+			if not hits: return self.transform_object.set(None)
+			o = hits[0]
+			x1, y1, x2, y2 = object_box(o, self.canvas)
+			self.canvas_transform.show_handles = not isinstance(o, tuple)
+			objects.remove(o) # remove it from <objects> list
+			object_index.remove(o)
+			self.transform_object.set(o)
+			self.canvas_transform.create(self.canvas, x1, y1, x2, y2)
+			self.transform_state.set(True)
 
 		def apply_transformations():
 			x1, y1, x2, y2 = self.canvas_transform.coords()
@@ -927,7 +953,7 @@ class UI(tk.Frame):
 				self.transform_object.object.set(x=x1, y=y1, width=x2-x1, height=y2-y1)
 				self.transform_object.object.tk_draw(self.canvas)
 			elif isinstance(self.transform_object.object, tuple):
-				self.canvas.coords(self.transform_object.object[0], x1, y1)
+				self.canvas.place_layer(layers[self.transform_object.object[0]], x1, y1)
 			elif isinstance(self.transform_object.object, int):
 				self.canvas.coords(self.transform_object.object, x1, y1, x2, y2)
 
@@ -1018,11 +1044,14 @@ class UI(tk.Frame):
 		# set up the canvas and local variables
 		self.canvas_marker = SelectionManager()
 		self.canvas_transform = TransformManager()
-		self.canvas = tk.Canvas(parent, bg="white")
+		# drawn in scene (image) pixels, panned with the middle button and zoomed with the wheel
+		self.canvas = SceneCanvas(parent, layers, bg="white")
 		self.canvas.pack(fill="both", expand=1)
 		self.canvas.bind("<Motion>", mouse_move)
 		self.canvas.bind("<Button-1>", mouse_click)
 		self.canvas.bind("<ButtonRelease-1>", mouse_release)
+		# the selection handles keep their size on screen
+		self.canvas.bind("<<Zoom>>", lambda e: self.transform_state and self.canvas_transform.update(self.canvas))
 		self.root.bind("<KeyPress>", key_press)
 		self.root.bind("<KeyRelease>", key_release)
 		self.root.bind("<Escape>", self.deselect_object)
@@ -0,0 +1,64 @@
+import numpy as np
+
+class Separability:
+	"""How well a tracker's fg separates from its bg, computed from the fg and bg histograms."""
+	def __init__(self, variance_ratio: float, bhattacharyya: float, fg_mean: float, bg_mean: float, auc: float) -> None:
+		self.variance_ratio = variance_ratio
+		self.bhattacharyya  = bhattacharyya
+		self.fg_mean        = fg_mean
+		self.bg_mean        = bg_mean
+		self.auc            = auc
+
+	def as_dict(self) -> dict:
+		return dict(self.__dict__)
+
+	def __str__(self) -> str:
+		return "(vr=%.3f, bd=%.3f, fg=%.3f, bg=%.3f, auc=%.3f)" % (self.variance_ratio, self.bhattacharyya, self.fg_mean, self.bg_mean, self.auc)
+
+	def __repr__(self) -> str:
+		return "Separability(variance_ratio: %.3f bhattacharyya: %.3f fg_mean: %.3f bg_mean: %.3f auc: %.3f)" % (self.variance_ratio, self.bhattacharyya, self.fg_mean, self.bg_mean, self.auc)
+
+def auc(p, q, ratios) -> float:
+	"""Returns the ROC AUC of classifying fg (p) against bg (q) pixels by their log likelihood ratio."""
+	# merge bins with equal ratios, since they can't be told apart
+	values, inverse = np.unique(ratios, return_inverse=True)
+	p = np.bincount(inverse, weights=p, minlength=len(values))
+	q = np.bincount(inverse, weights=q, minlength=len(values))
+
+	# a fg pixel beats every bg pixel with a lower ratio and ties with half of the equal ones
+	below = np.cumsum(q) - q
+	return float((p * (below + q / 2)).sum())
+
+def histogram_metrics(fg_count, bg_count, ratios = None) -> Separability:
+	"""Returns the separability metrics of a pair of fg and bg histograms."""
+	from util import log_likelihood_ratios, variance_ratio
+
+	p = fg_count / (fg_count.sum() or 1)
+	q = bg_count / (bg_count.sum() or 1)
+	L = log_likelihood_ratios(fg_count, bg_count) if ratios is None else ratios
+
+	coefficient = np.sqrt(p * q).sum()
+	return Separability(
+		variance_ratio = variance_ratio(fg_count, bg_count, L),
+		bhattacharyya  = float(-np.log(coefficient)) if coefficient > 0 else float("inf"),
+		fg_mean        = float((p * L).sum()),
+		bg_mean        = float((q * L).sum()),
+		auc            = auc(p, q, L),
+	)
+
+def likelihood_metrics(image, tracker, mode = "RGB", color_count = 64) -> Separability:
+	"""Returns the separability metrics of a tracker without rendering the likelihood image."""
+	from util import constrain, likelihood_counts
+	counts = likelihood_counts(image, tracker, mode, int(constrain(color_count, 1, 255)))
+	if counts is None: return
+	return histogram_metrics(counts[1], counts[2])
+
+def likelihood_image_metrics(image, tracker, mode = "RGB", color_count = 64) -> tuple:
+	"""Returns (likelihood image, separability metrics), computed from the same histograms."""
+	from util import constrain, likelihood_counts, log_likelihood_ratios, likelihood_table, array_to_image
+	counts = likelihood_counts(image, tracker, mode, int(constrain(color_count, 1, 255)))
+	if counts is None: return (None, None)
+	img, fg_count, bg_count = counts
+
+	ratios = log_likelihood_ratios(fg_count, bg_count)
+	return (array_to_image(likelihood_table(ratios)[img]), histogram_metrics(fg_count, bg_count, ratios))
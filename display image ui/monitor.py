@@ -0,0 +1,83 @@
+import numpy as np
+
+class ConfidenceMonitor:
+	"""Watches a tracker's fg likelihood mass and separability and decides when its target is lost.
+
+	The mass thresholds are relative to the mass measured on the first frame. While the target is
+	lost the search region grows by <growth> every frame, and after <global_after> frames the whole
+	frame is searched, until both measures climb back over the "found" thresholds. With blobs=True
+	the target is looked for as the strongest blob of positive weights (see blobs.py) instead of
+	the best fg-sized box."""
+	def __init__(self, lost_mass: float = 0.5, found_mass: float = 0.75, lost_auc: float = 0.6, found_auc: float = 0.7, patience: int = 3, growth: float = 2, global_after: int = 3, blobs: bool = False) -> None:
+		self.lost_mass    = lost_mass
+		self.found_mass   = found_mass
+		self.lost_auc     = lost_auc
+		self.found_auc    = found_auc
+		self.patience     = patience
+		self.growth       = growth
+		self.global_after = global_after
+		self.blobs        = blobs
+		self.reset(1, 1)
+
+	def reset(self, mass: float, auc: float) -> None:
+		"""Starts monitoring with the measures of a target that's known to be found."""
+		self.reference   = max(mass, 0.01)
+		self.mass        = mass
+		self.auc         = auc
+		self.lost        = False
+		self.low_frames  = 0
+		self.lost_frames = 0
+
+	def measure(self, img, tracker, model) -> tuple:
+		"""Returns (fg likelihood mass, ROC AUC) of the tracker on a quantized image array under the model."""
+		from metrics import auc
+		fg_count, bg_count, ratios = model.aligned(*model.counts(img, tracker))
+		p = fg_count / (fg_count.sum() or 1)
+		q = bg_count / (bg_count.sum() or 1)
+		return (float((p * ratios).sum()), auc(p, q, ratios))
+
+	def update(self, mass: float, auc: float) -> bool:
+		"""Records the measures of a new frame and returns whether the target is lost."""
+		self.mass, self.auc = (mass, auc)
+		if not self.lost:
+			# only give up after a few bad frames in a row
+			low = mass < self.lost_mass * self.reference or auc < self.lost_auc
+			self.low_frames = self.low_frames + 1 if low else 0
+			if self.low_frames >= self.patience:
+				self.lost = True
+				self.lost_frames = 0
+		else:
+			self.lost_frames += 1
+			if mass >= self.found_mass * self.reference and auc >= self.found_auc:
+				self.lost = False
+				self.low_frames = 0
+		return self.lost
+
+	def search_margin(self, bg_margin: int, width: int, height: int) -> int:
+		"""Returns the margin to search around the tracker in the next frame."""
+		if not self.lost: return bg_margin
+		if self.lost_frames >= self.global_after: return max(width, height)
+		return int(max(bg_margin, 1) * self.growth ** (self.lost_frames + 1))
+
+	def redetect(self, img, tracker, model):
+		"""Returns the tracker moved to the fg-sized box with the highest likelihood in a quantized image array."""
+		if self.blobs:
+			import blobs
+			return blobs.redetect(model.weights(img), tracker)
+		return redetect(model.weights(img), tracker)
+
+def redetect(weights, tracker):
+	"""Returns the tracker moved to the fg-sized box with the most positive weight, found with an integral image."""
+	from tracking import move_to
+	from util import integral, integral_box_sums
+
+	h, w = weights.shape[:2]
+	x1, y1, x2, y2 = tracker.fg_coords()
+	bw = int(min(max(x2 - x1, 1), w))
+	bh = int(min(max(y2 - y1, 1), h))
+
+	# only positive evidence counts, scaled to integers for the integral image
+	sums = integral_box_sums(integral(np.maximum(weights, 0) * 127), bw, bh)
+	if sums.size == 0 or sums.max() <= 0: return tracker
+	y, x = np.unravel_index(np.argmax(sums), sums.shape)
+	return move_to(tracker, x, y)
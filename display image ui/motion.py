@@ -0,0 +1,41 @@
+import numpy as np
+
+class MotionModel:
+	"""Constant velocity Kalman filter over the center of a tracker's fg box.
+
+	It predicts where the target will be in the next frame and how unsure that prediction is, so
+	the search window can follow the target's motion instead of a fixed worst-case margin."""
+	def __init__(self, x: float, y: float, process_noise: float = 1, measurement_noise: float = 2, sigmas: float = 3, min_margin: int = 4, max_margin: int = 200) -> None:
+		self.sigmas = sigmas
+		self.min_margin = min_margin
+		self.max_margin = max_margin
+
+		# state: (x, y, vx, vy)
+		self.state = np.array([x, y, 0, 0], dtype=float)
+		self.covariance = np.diag([measurement_noise ** 2] * 2 + [max_margin ** 2 / sigmas ** 2] * 2).astype(float)
+		self.transition = np.array([[1, 0, 1, 0], [0, 1, 0, 1], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=float)
+		self.observation = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], dtype=float)
+		self.process = process_noise ** 2 * np.array([[1/4, 0, 1/2, 0], [0, 1/4, 0, 1/2], [1/2, 0, 1, 0], [0, 1/2, 0, 1]])
+		self.measurement = measurement_noise ** 2 * np.eye(2)
+
+	def predict(self) -> tuple:
+		"""Advances the model by a frame and returns the predicted center (x, y)."""
+		self.state = self.transition @ self.state
+		self.covariance = self.transition @ self.covariance @ self.transition.T + self.process
+		return (self.state[0], self.state[1])
+
+	def correct(self, x: float, y: float) -> None:
+		"""Updates the model with the measured center of the current frame."""
+		innovation = np.array([x, y]) - self.observation @ self.state
+		S = self.observation @ self.covariance @ self.observation.T + self.measurement
+		K = self.covariance @ self.observation.T @ np.linalg.inv(S)
+		self.state = self.state + K @ innovation
+		self.covariance = (np.eye(4) - K @ self.observation) @ self.covariance
+
+	def margin(self) -> int:
+		"""Returns the search margin covering <sigmas> standard deviations of the predicted position."""
+		std = np.sqrt(max(self.covariance[0, 0], self.covariance[1, 1]))
+		return int(min(max(self.sigmas * std, self.min_margin), self.max_margin))
+
+	def __repr__(self) -> str:
+		return "MotionModel(x: %.1f y: %.1f vx: %.2f vy: %.2f margin: %d)" % (*self.state, self.margin())
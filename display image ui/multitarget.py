@@ -0,0 +1,149 @@
+import numpy as np
+
+class MultiFollower:
+	"""Follows several trackers through a sequence jointly, with one shared background model.
+
+	Every frame the bg histogram is counted once, over the bg rings of all trackers minus all their
+	fg boxes. Each target's fg histogram leaves out the pixels of the other fg boxes, and the other
+	targets count as its background, so every model tells its target apart from the others too.
+
+	After the independent mean shift searches the targets are assigned greedily, most confident
+	first: a target whose box lands on one that's already taken searches again with the taken
+	pixels suppressed, so two trackers can't collapse onto the same object."""
+	def __init__(self, trackers: list, mode: str = "RGB", color_count: int = 64, iterations: int = 10, epsilon: float = 1, kernel: bool = True, quantizer = None, max_overlap: float = 0.3) -> None:
+		from tracking import Model
+		from workspace import Workspace
+		self.trackers = list(trackers)
+		self.model = Model(mode, color_count, kernel, quantizer)
+		if self.model.sparse or isinstance(quantizer, str): raise Exception("Joint tracking needs a dense model with a fixed quantizer")
+		self.iterations = iterations
+		self.epsilon = epsilon
+		self.max_overlap = max_overlap
+		self.fg_counts = []
+		self.ratios = []
+		self.workspace = Workspace()
+		self.frame = 0
+
+	def window(self, width: int, height: int) -> tuple:
+		"""Returns the window (x1, y1, x2, y2) around every tracker's search region."""
+		from util import constrain_box
+		boxes = []
+		for tracker in self.trackers:
+			x1, y1, x2, y2 = tracker.fg_coords()
+			m = tracker.bg_margin
+			boxes.append((x1 - m, y1 - m, x2 + m, y2 + m))
+		x1, y1, x2, y2 = zip(*boxes)
+		return constrain_box((min(x1), min(y1), max(x2), max(y2)), width, height)
+
+	def counts(self, img, trackers: list) -> tuple:
+		"""Returns the shared bg histogram, the fg union histogram, and every target's exclusive and weighted fg histograms.
+
+		The exclusive histograms count the pixels of a fg box no other fg box covers, the weighted
+		ones count the same pixels with the kernel's weights."""
+		from math import floor
+		from util import constrain_box
+		h, w = img.shape[:2]
+		n = self.model.color_count + 1
+
+		# how many fg boxes cover every pixel, and whether any bg ring does
+		cover = np.zeros((h, w), dtype=np.uint8)
+		ring = np.zeros((h, w), dtype=bool)
+		boxes = [constrain_box(tracker.fg_coords(), w, h) for tracker in trackers]
+		for tracker, (x1, y1, x2, y2) in zip(trackers, boxes):
+			bx1, by1, bx2, by2 = constrain_box(tracker.bg_coords(), w, h)
+			ring[by1:by2, bx1:bx2] = True
+			cover[y1:y2, x1:x2] += 1
+		bg_count = np.bincount(img[ring & (cover == 0)], minlength=n)
+		fg_union = np.bincount(img[cover > 0], minlength=n)
+
+		exclusive, weighted = ([], [])
+		for tracker, (x1, y1, x2, y2) in zip(trackers, boxes):
+			region = img[y1:y2, x1:x2]
+			own = cover[y1:y2, x1:x2] == 1
+			exclusive.append(np.bincount(region[own], minlength=n))
+			weights = own.astype(float)
+			kernel = self.model.mask(tracker)
+			if kernel is not None:
+				# only use the part of the kernel that's inside the image
+				fx1, fy1, _, _ = tracker.fg_coords()
+				kx, ky = (x1 - floor(fx1), y1 - floor(fy1))
+				kernel = kernel[ky:ky + y2 - y1, kx:kx + x2 - x1]
+				weights = weights[:kernel.shape[0], :kernel.shape[1]] * kernel
+			weighted.append(np.bincount(region[:weights.shape[0], :weights.shape[1]].ravel(), weights.ravel(), minlength=n))
+		return (bg_count, fg_union, exclusive, weighted)
+
+	def fit(self, img, trackers: list, learn: bool = False) -> None:
+		"""Updates every target's ratios from the shared bg of a quantized image array, and its fg histogram too if <learn>."""
+		from util import log_likelihood_ratios
+		bg_count, fg_union, exclusive, weighted = self.counts(img, trackers)
+		if learn: self.fg_counts = weighted
+		# the other targets are part of every target's background
+		self.ratios = [log_likelihood_ratios(fg, bg_count + fg_union - own) for fg, own in zip(self.fg_counts, exclusive)]
+
+	def start(self, frame) -> list:
+		"""Builds the models from the first frame."""
+		from util import image_to_array
+		frame = image_to_array(frame)
+		x1, y1, x2, y2 = self.window(frame.shape[1], frame.shape[0])
+		img = self.model.quantize(frame[y1:y2, x1:x2], self.workspace)
+		self.fit(img, [tracker.offset(x1, y1) for tracker in self.trackers], learn=True)
+		self.frame = 1
+		return self.trackers
+
+	def shift(self, dx: float, dy: float) -> None:
+		"""Moves every tracker by a global camera shift."""
+		self.trackers = [tracker.offset(-int(round(dx)), -int(round(dy))) for tracker in self.trackers]
+
+	def step(self, frame) -> list:
+		"""Finds the trackers in the next frame and returns them."""
+		from tracking import mean_shift
+		from util import constrain_box, image_to_array
+		frame = image_to_array(frame)
+		x1, y1, x2, y2 = self.window(frame.shape[1], frame.shape[0])
+		img = self.model.quantize(frame[y1:y2, x1:x2], self.workspace)
+		trackers = [tracker.offset(x1, y1) for tracker in self.trackers]
+
+		# the background is counted once, around where the targets were
+		self.fit(img, trackers)
+
+		# search for every target on its own, and score where it ended up
+		results, scores = ([], [])
+		for tracker, ratios in zip(trackers, self.ratios):
+			weights = self.workspace.remap(ratios, img, "weights")
+			result, _ = mean_shift(weights, tracker, self.iterations, self.epsilon, self.model.mask(tracker))
+			bx1, by1, bx2, by2 = constrain_box(result.fg_coords(), img.shape[1], img.shape[0])
+			box = weights[by1:by2, bx1:bx2]
+			results.append(result)
+			scores.append(float(np.maximum(box, 0).mean()) if box.size else 0)
+
+		# assign the most confident targets first, the others can't take their pixels
+		claimed = np.zeros(img.shape[:2], dtype=bool)
+		for i in np.argsort(scores, kind="stable")[::-1]:
+			bx1, by1, bx2, by2 = constrain_box(results[i].fg_coords(), img.shape[1], img.shape[0])
+			taken = claimed[by1:by2, bx1:bx2]
+			if taken.size and taken.mean() > self.max_overlap:
+				weights = self.workspace.remap(self.ratios[i], img, "weights")
+				weights[claimed] = -1
+				results[i], _ = mean_shift(weights, trackers[i], self.iterations, self.epsilon, self.model.mask(trackers[i]))
+				bx1, by1, bx2, by2 = constrain_box(results[i].fg_coords(), img.shape[1], img.shape[0])
+			claimed[by1:by2, bx1:bx2] = True
+
+		self.trackers = [result.offset(-x1, -y1) for result in results]
+		self.frame += 1
+		return self.trackers
+
+def track_targets(frames, trackers: list, camera: bool = True, **kwargs):
+	"""Yields the list of trackers for every frame of a sequence, tracked jointly (see MultiFollower).
+
+	With camera=True the global camera shift is applied first, like tracking.track_all."""
+	from camera import CameraMotion
+	from util import image_to_array
+
+	follower = MultiFollower(trackers, **kwargs)
+	motion = CameraMotion() if camera else None
+	for i, frame in enumerate(frames):
+		frame = image_to_array(frame)
+		if motion:
+			dx, dy = motion.update(frame)
+			if i: follower.shift(dx, dy)
+		yield follower.start(frame) if i == 0 else follower.step(frame)
@@ -0,0 +1,128 @@
+import numpy as np
+
+class Quantizer:
+	"""Maps RGB pixels to bins through a precomputed 3-D lookup table.
+
+	The table has 2**bits cells per channel, so a frame is quantized by a single gather, however
+	the bins were defined. Bins are numbered 0 to color_count, like util.quantize."""
+	def __init__(self, lut, bits: int = 5) -> None:
+		self.bits = bits
+		self.color_count = int(lut.max())
+		# small tables are kept as intp so their bins can be counted without a conversion
+		self.lut = lut.ravel().astype(np.intp if bits <= 6 else lut.dtype)
+
+	@classmethod
+	def from_function(cls, function, bits: int = 5):
+		"""Builds a quantizer by evaluating function(r, g, b) -> bins at the center of every table cell, a red plane at a time."""
+		size = 1 << bits
+		centers = (np.arange(size) + 0.5) * (256 / size)
+		g, b = np.meshgrid(centers, centers, indexing="ij")
+		planes = [np.asarray(function(np.full_like(g, r), g, b)) for r in centers]
+		lut = np.stack(planes)
+		return cls(lut.astype(np.uint8 if lut.max() < 256 else np.uint16), bits)
+
+	@classmethod
+	def mean(cls, mode: str = "RGB", color_count: int = 64, bits: int = 8):
+		"""The grey average of util.quantize (exact at 8 bits)."""
+		selector = ["R" in mode, "G" in mode, "B" in mode]
+		def function(r, g, b):
+			r, g, b = ((np.floor(c) if bits == 8 else c) for c in (r, g, b))
+			channels = [c for c, s in zip((r, g, b), selector) if s]
+			return (sum(channels) / len(channels) / 255 * color_count).astype(int)
+		return cls.from_function(function, bits)
+
+	@classmethod
+	def uniform(cls, bins: int = 8, bits: int = 5):
+		"""Joint RGB bins: every channel is split into <bins> equal parts, giving bins**3 bins."""
+		def function(r, g, b):
+			r, g, b = ((c * bins / 256).astype(int) for c in (r, g, b))
+			return (r * bins + g) * bins + b
+		return cls.from_function(function, bits)
+
+	@classmethod
+	def chromaticity(cls, bins: int = 16, bits: int = 5):
+		"""Normalized rg chromaticity bins (brightness independent), giving bins**2 bins."""
+		def function(r, g, b):
+			total = r + g + b
+			rn = np.minimum((r / total * bins).astype(int), bins - 1)
+			gn = np.minimum((g / total * bins).astype(int), bins - 1)
+			return rn * bins + gn
+		return cls.from_function(function, bits)
+
+	@classmethod
+	def palette(cls, colors, bits: int = 5):
+		"""Bins of the nearest palette colour."""
+		colors = np.asarray(colors, dtype=np.float32)
+		def function(r, g, b):
+			cells = np.stack((r, g, b), -1).astype(np.float32)
+			distances = ((cells[..., None, :] - colors) ** 2).sum(-1)
+			return distances.argmin(-1)
+		return cls.from_function(function, bits)
+
+	@classmethod
+	def median_cut(cls, pixels, colors: int = 16, bits: int = 5):
+		"""Palette bins learned from pixels (e.g. a tracker's bg region) by median cut."""
+		return cls.palette(median_cut(pixels, colors), bits)
+
+	@classmethod
+	def kmeans(cls, pixels, colors: int = 16, bits: int = 5, iterations: int = 10, seed: int = 0):
+		"""Palette bins learned from pixels (e.g. a tracker's bg region) by k-means, starting from median cut."""
+		return cls.palette(kmeans(pixels, colors, iterations, seed), bits)
+
+	def index(self, img, out = None):
+		"""Returns the table cell of every pixel of an RGB image array, written into out if it's given."""
+		shift = 8 - self.bits
+		if out is None: out = np.empty(img.shape[:2], dtype=np.intp)
+		np.right_shift(img[..., 0], shift, out=out, casting="unsafe")
+		np.left_shift(out, self.bits, out=out)
+		out |= img[..., 1] >> shift
+		np.left_shift(out, self.bits, out=out)
+		out |= img[..., 2] >> shift
+		return out
+
+	def __call__(self, img, out = None, scratch = None):
+		"""Returns the bin of every pixel of an RGB image array.
+
+		If out (of the table's dtype) and scratch (an intp array) are given, no arrays are allocated."""
+		return np.take(self.lut, self.index(img, scratch), out=out, mode="clip")
+
+	def __repr__(self) -> str:
+		return "Quantizer(bits: %d bins: %d)" % (self.bits, self.color_count + 1)
+
+def median_cut(pixels, colors: int = 16):
+	"""Returns a palette of up to <colors> colours splitting the pixels by median cut."""
+	boxes = [np.asarray(pixels, dtype=np.float32).reshape(-1, 3)]
+	while len(boxes) < colors:
+		# split the box with the widest channel range at that channel's median
+		ranges = [np.ptp(box, 0).max() if len(box) > 1 else -1 for box in boxes]
+		i = int(np.argmax(ranges))
+		if ranges[i] <= 0: break
+		box = boxes.pop(i)
+		channel = np.ptp(box, 0).argmax()
+		box = box[box[:, channel].argsort()]
+		boxes += [box[:len(box) // 2], box[len(box) // 2:]]
+	return np.array([box.mean(0) for box in boxes])
+
+def kmeans(pixels, colors: int = 16, iterations: int = 10, seed: int = 0, samples: int = 20000):
+	"""Returns a palette of <colors> k-means centers of the pixels (subsampled to <samples>)."""
+	pixels = np.asarray(pixels, dtype=np.float32).reshape(-1, 3)
+	if len(pixels) > samples:
+		pixels = pixels[np.random.default_rng(seed).choice(len(pixels), samples, replace=False)]
+	centers = median_cut(pixels, colors)
+	for _ in range(iterations):
+		labels = ((pixels[:, None, :] - centers) ** 2).sum(-1).argmin(1)
+		counts = np.bincount(labels, minlength=len(centers))
+		for c in range(3):
+			sums = np.bincount(labels, weights=pixels[:, c], minlength=len(centers))
+			centers[:, c] = np.where(counts, sums / np.maximum(counts, 1), centers[:, c])
+	return centers
+
+def region_pixels(img, tracker):
+	"""Returns the (N, 3) RGB pixels of a tracker's bg ring in an image array."""
+	from util import constrain_box
+	h, w = img.shape[:2]
+	fx1, fy1, fx2, fy2 = constrain_box(tracker.fg_coords(), w, h)
+	bx1, by1, bx2, by2 = constrain_box(tracker.bg_coords(), w, h)
+	mask = np.ones((by2 - by1, bx2 - bx1), dtype=bool)
+	mask[fy1 - by1:fy2 - by1, fx1 - bx1:fx2 - bx1] = False
+	return img[by1:by2, bx1:bx2][mask]
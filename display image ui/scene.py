@@ -0,0 +1,31 @@
+import json
+import os
+from tracker import Tracker
+
+__location__ = __file__[:__file__.rfind("/")+1]
+__scene_file__ = "objects.json"
+
+def read_scenes(path: str = None) -> dict:
+	"""Returns all scenes saved by the editor."""
+	path = path or __location__ + __scene_file__
+	if not os.path.exists(path): return {}
+	with open(path, "r") as file:
+		return json.loads(file.read())
+
+def read_scene(name: str, path: str = None) -> tuple:
+	"""Returns (image path, trackers) of a saved scene, with the trackers relative to the image."""
+	scene = read_scenes(path).get(name.upper())
+	if scene is None: raise Exception(f"Scene {name} does not exist")
+
+	image = None
+	trackers = []
+	for obj_name, values in scene.items():
+		if not "_" in obj_name: continue
+		kind = obj_name.split("_")[0]
+		if kind.lower() == "tracker":
+			trackers.append(Tracker(values["x"], values["y"], values["width"], values["height"], bg_margin=values["bg_margin"], mode=values["mode"]))
+		if kind.lower() == "image" and image is None:
+			image = values
+
+	if image is None: raise Exception(f"Scene {name} has no image")
+	return (image["file"].replace("$", __location__), [t.offset(image["x1"], image["y1"]) for t in trackers])
@@ -0,0 +1,172 @@
+import os
+import time
+from math import ceil, floor
+import numpy as np
+
+class StreamStats:
+	"""Latency and drop counts of a stream."""
+	def __init__(self, name: str) -> None:
+		self.name = name
+		self.processed = 0
+		self.dropped = 0
+		self.late = 0
+		self.latencies = []
+		self.first = None # arrival of the first processed frame, seconds from the start
+		self.elapsed = 0  # from then until the last frame was done
+
+	def record(self, latency: float, late: bool) -> None:
+		self.processed += 1
+		self.late += late
+		self.latencies.append(latency)
+
+	def as_dict(self) -> dict:
+		latencies = np.array(self.latencies or [0])
+		total = self.processed + self.dropped
+		return {
+			"stream":      self.name,
+			"processed":   self.processed,
+			"dropped":     self.dropped,
+			"late":        self.late,
+			"drop_rate":   self.dropped / total if total else 0,
+			"mean_ms":     float(latencies.mean() * 1000),
+			"p95_ms":      float(np.percentile(latencies, 95) * 1000),
+			"max_ms":      float(latencies.max() * 1000),
+			"fps":         self.processed / self.elapsed if self.elapsed else 0,
+		}
+
+	def __str__(self) -> str:
+		return "{stream}: {processed} processed, {dropped} dropped ({drop_rate:.1%}), {late} late, latency mean {mean_ms:.1f} p95 {p95_ms:.1f} max {max_ms:.1f} ms, {fps:.1f} fps".format(**self.as_dict())
+
+class Stream:
+	"""A frame source and the trackers followed through it, with a frame rate deadline.
+
+	Frame i arrives i / fps seconds after the start and should be done before the next one
+	arrives. When the stream falls behind, frames that have been waiting longer than max_lag
+	seconds by the time the stream is free are dropped, so it skips ahead instead of building
+	a backlog. max_lag=0 always jumps to the newest frame, max_lag=None never drops.
+
+	Frames can be any iterable of RGB frames. Indexable ones (like a sequence.Sequence) skip
+	frames without reading them, others have the skipped frames read and thrown away."""
+	def __init__(self, name: str, frames, trackers: list, fps: float = 30, max_lag: float = 0, **kwargs) -> None:
+		from tracking import Follower
+		self.name = name
+		self.frames = frames
+		self.indexed = hasattr(frames, "__getitem__") and hasattr(frames, "__len__")
+		self.iterator = None if self.indexed else iter(frames)
+		self.followers = [Follower(tracker, **kwargs) for tracker in trackers]
+		self.fps = fps
+		self.max_lag = max_lag
+		self.next = 0     # index of the next frame to process
+		self.position = 0 # frames read from the iterator
+		self.finished = False
+		self.stats = StreamStats(name)
+
+	def due(self, index: int) -> float:
+		"""Returns the time (from the start) frame <index> arrives at."""
+		return index / self.fps
+
+	def pick(self, elapsed: float) -> int:
+		"""Returns the index of the frame to process <elapsed> seconds after the start, or None if it hasn't arrived yet."""
+		if self.indexed and self.next >= len(self.frames):
+			self.finished = True
+			return None
+		arrived = floor(elapsed * self.fps + 1e-9)
+		if self.next > arrived: return None
+		index = self.next
+		if self.max_lag is not None:
+			index = min(max(index, ceil((elapsed - self.max_lag) * self.fps - 1e-9)), arrived)
+			if self.indexed: index = min(index, len(self.frames) - 1)
+		self.stats.dropped += index - self.next
+		self.next = index + 1
+		return index
+
+	def read(self, index: int):
+		"""Returns frame <index>, or None at the end of the stream."""
+		if self.indexed: return self.frames[index]
+		try:
+			while self.position <= index:
+				frame = next(self.iterator)
+				self.position += 1
+			return frame
+		except StopIteration:
+			# frames past the end weren't dropped, they never existed
+			self.stats.dropped -= index - self.position
+			return None
+
+	def process(self, index: int) -> list:
+		"""Tracks into frame <index>, returns the trackers, or None at the end of the stream."""
+		frame = self.read(index)
+		if frame is None: return None
+		return [follower.start(frame) if follower.frame == 0 else follower.step(frame) for follower in self.followers]
+
+class Scheduler:
+	"""Runs many streams at once on a thread pool, each at its own frame rate.
+
+	A stream has at most one frame in flight, because its trackers depend on the previous frame,
+	so a worker is never blocked on another one. on_result(stream, index, trackers) is called
+	in the scheduling thread for every processed frame."""
+	def __init__(self, streams: list, workers: int = None, on_result = None) -> None:
+		self.streams = streams
+		self.workers = workers or min(len(streams), os.cpu_count())
+		self.on_result = on_result
+
+	def run(self, duration: float = None) -> list:
+		"""Runs until every stream has ended (or for <duration> seconds), returns their stats."""
+		from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+		start = time.perf_counter()
+		running = {}
+		with ThreadPoolExecutor(max_workers=self.workers) as pool:
+			while True:
+				elapsed = time.perf_counter() - start
+				stopping = duration is not None and elapsed >= duration
+				busy = set(stream for stream, _ in running.values())
+				if not stopping:
+					for stream in self.streams:
+						if stream in busy or stream.finished: continue
+						index = stream.pick(elapsed)
+						if index is not None: running[pool.submit(stream.process, index)] = (stream, index)
+				if not running:
+					if stopping or all(stream.finished for stream in self.streams): break
+					# sleep until the next frame arrives
+					waiting = [stream.due(stream.next) - elapsed for stream in self.streams if not stream.finished]
+					time.sleep(max(min(waiting), 0))
+					continue
+
+				# wake up when a frame is done or the next one arrives, whichever comes first
+				idle = [stream.due(stream.next) - elapsed for stream in self.streams if not stream in busy and not stream.finished]
+				done, _ = wait(running, timeout=max(min(idle), 0) if idle else None, return_when=FIRST_COMPLETED)
+				now = time.perf_counter() - start
+				for future in done:
+					stream, index = running.pop(future)
+					trackers = future.result()
+					if trackers is None:
+						stream.finished = True
+						continue
+					if stream.stats.first is None: stream.stats.first = stream.due(index)
+					stream.stats.record(now - stream.due(index), now > stream.due(index + 1))
+					stream.stats.elapsed = now - stream.stats.first
+					if self.on_result: self.on_result(stream, index, trackers)
+
+		return [stream.stats for stream in self.streams]
+
+if __name__ == "__main__":
+	import argparse
+	from sequence import Sequence
+	from tracker import Tracker
+	parser = argparse.ArgumentParser(description="Track the first ground truth box of many sequences at once, in real time.")
+	parser.add_argument("sequences", nargs="+", help="directories of frames with a groundtruth.txt")
+	parser.add_argument("--fps", type=float, default=30)
+	parser.add_argument("--max-lag", type=float, default=0, help="seconds a frame may wait before it's dropped (negative: never drop)")
+	parser.add_argument("--bg-margin", type=int, default=20)
+	parser.add_argument("--color-count", type=int, default=64)
+	parser.add_argument("--workers", type=int, default=None)
+	args = parser.parse_args()
+
+	streams = []
+	for path in args.sequences:
+		sequence = Sequence(path)
+		x, y, w, h = sequence.boxes[0]
+		tracker = Tracker(x, y, w, h, bg_margin=args.bg_margin, mode="TOPLEFT")
+		streams.append(Stream(os.path.basename(os.path.normpath(path)), sequence, [tracker], args.fps, args.max_lag if args.max_lag >= 0 else None, color_count=args.color_count))
+	for stats in Scheduler(streams, args.workers).run():
+		print(stats)
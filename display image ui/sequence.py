@@ -0,0 +1,51 @@
+import os
+
+FRAME_TYPES = (".png", ".jpg", ".jpeg", ".bmp", ".ppm", ".gif")
+
+def read_boxes(path: str) -> list:
+	"""Returns the (x, y, w, h) boxes of a ground truth file with one box per line, separated by commas, tabs or spaces."""
+	boxes = []
+	with open(path, "r") as file:
+		for line in file:
+			values = line.replace(",", " ").replace("\t", " ").split()
+			if len(values) >= 4: boxes.append(tuple(float(v) for v in values[:4]))
+	return boxes
+
+def write_boxes(path: str, boxes: list) -> None:
+	"""Writes (x, y, w, h) boxes in the ground truth format, one per line."""
+	with open(path, "w") as file:
+		file.writelines("%g,%g,%g,%g\n" % tuple(box) for box in boxes)
+
+def tracker_box(tracker) -> tuple:
+	"""Returns the (x, y, w, h) box of a tracker's fg."""
+	x1, y1, x2, y2 = tracker.fg_coords()
+	return (x1, y1, x2 - x1, y2 - y1)
+
+class Sequence:
+	"""A directory of frames, sorted by name, with an optional ground truth file."""
+	def __init__(self, path: str, cache = None, groundtruth: str = "groundtruth.txt") -> None:
+		self.path = os.path.join(path, "")
+		self.cache = cache
+		self.frames = sorted(self.path + name for name in os.listdir(self.path) if name.lower().endswith(FRAME_TYPES))
+		self.boxes = read_boxes(self.path + groundtruth) if os.path.exists(self.path + groundtruth) else []
+		self.position = 0
+
+	def __len__(self) -> int:
+		return len(self.frames)
+
+	def __getitem__(self, index: int):
+		"""Returns the RGB array of a frame."""
+		from framecache import load_frame
+		return load_frame(self.frames[index], self.cache)
+
+	def seek(self, index: int) -> None:
+		"""Makes iteration start at the given frame."""
+		self.position = index
+
+	def __iter__(self):
+		while self.position < len(self.frames):
+			self.position += 1
+			yield self[self.position - 1]
+
+	def __str__(self) -> str:
+		return "Sequence(path={}, frames={}, boxes={})".format(self.path, len(self.frames), len(self.boxes))
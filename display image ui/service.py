@@ -0,0 +1,256 @@
+import asyncio
+import json
+import os
+import struct
+import numpy as np
+
+# every message is a 4 byte big endian header length, a JSON header and <header["size"]> bytes of payload
+HEADER = struct.Struct(">I")
+FOLLOWER_OPTIONS = ("mode", "color_count", "iterations", "epsilon", "kernel", "motion", "quantizer", "smoothing")
+
+def encode(header: dict, payload: bytes = b"") -> bytes:
+	"""Returns a message as bytes."""
+	header = json.dumps(dict(header, size=len(payload))).encode()
+	return HEADER.pack(len(header)) + header + payload
+
+async def read_message(reader: asyncio.StreamReader) -> tuple:
+	"""Reads a message from a stream, returns (header, payload), or None at the end of the stream."""
+	try:
+		length, = HEADER.unpack(await reader.readexactly(HEADER.size))
+		header = json.loads(await reader.readexactly(length))
+		payload = await reader.readexactly(header.get("size", 0))
+	except asyncio.IncompleteReadError:
+		return None
+	return (header, payload)
+
+def read_frame(header: dict, payload: bytes):
+	"""Returns the (height, width, 3) uint8 RGB frame of a request."""
+	frame = np.frombuffer(payload, dtype=np.uint8)
+	return frame.reshape(header["shape"])
+
+def box(tracker) -> list:
+	"""Returns the (x, y, w, h) box of a tracker's fg."""
+	x1, y1, x2, y2 = tracker.fg_coords()
+	return [x1, y1, x2 - x1, y2 - y1]
+
+def likelihood_crop(follower, frame):
+	"""Returns the 8-bit likelihood of a follower's bg region, and the region's top left corner."""
+	from util import constrain_box, likelihood_table
+	h, w = frame.shape[:2]
+	x1, y1, x2, y2 = constrain_box(follower.tracker.bg_coords(), w, h)
+	window = follower.model.quantize(frame[y1:y2, x1:x2])
+	return (likelihood_table(follower.model.weights(window)), (x1, y1))
+
+class Session:
+	"""The trackers of one client, kept between requests so their models are only built once."""
+	def __init__(self, name: str) -> None:
+		self.name = name
+		self.followers = {}
+		self.lock = asyncio.Lock()
+
+	def start(self, definitions: dict) -> None:
+		"""Creates followers from {name: {"x", "y", "w", "h", "bg_margin", follower options...}}."""
+		from tracker import Tracker
+		from tracking import Follower
+		for name, d in definitions.items():
+			tracker = Tracker(d["x"], d["y"], d["w"], d["h"], bg_margin=d.get("bg_margin", 20), mode="TOPLEFT")
+			self.followers[name] = Follower(tracker, **{k: v for k, v in d.items() if k in FOLLOWER_OPTIONS})
+
+class Job:
+	"""A tracking request waiting for the worker pool: the followers to run on a frame."""
+	def __init__(self, session: Session, names: list, frame, likelihood: bool) -> None:
+		self.session = session
+		self.names = names
+		self.frame = frame
+		self.likelihood = likelihood
+		self.future = asyncio.get_running_loop().create_future()
+
+	def run(self) -> tuple:
+		"""Starts or steps the followers, returns (header, payload) of the response."""
+		boxes, lost, crops, payload = ({}, {}, {}, [])
+		for name in self.names:
+			follower = self.session.followers[name]
+			tracker = follower.start(self.frame) if follower.frame == 0 else follower.step(self.frame)
+			boxes[name] = box(tracker)
+			lost[name] = follower.monitor.lost
+			if self.likelihood:
+				crop, offset = likelihood_crop(follower, self.frame)
+				crops[name] = {"offset": offset, "shape": crop.shape}
+				payload.append(crop.tobytes())
+		header = {"ok": True, "boxes": boxes, "lost": lost}
+		if self.likelihood: header["crops"] = crops
+		return (header, b"".join(payload))
+
+def run_jobs(jobs: list) -> list:
+	"""Runs a chunk of a batch on a worker, returns (header, payload) or the exception of every job."""
+	results = []
+	for job in jobs:
+		try: results.append(job.run())
+		except Exception as e: results.append(e)
+	return results
+
+class TrackingService:
+	"""Local tracking server, over a Unix socket or localhost TCP.
+
+	Requests waiting at the same time are batched and split over the worker threads, so a busy
+	service pays one hand-off per worker rather than one per request. Every client names a
+	session, created by its first start, and its followers stay in memory until it stops them,
+	across connections too.
+
+	Requests (JSON header, frame as raw RGB bytes in the payload):
+	  {"op": "start", "session": s, "shape": [h, w, 3], "trackers": {name: {"x", "y", "w", "h", ...}}}
+	  {"op": "step",  "session": s, "shape": [h, w, 3], "trackers": [names] (default: all), "likelihood": bool}
+	  {"op": "stop",  "session": s, "trackers": [names] (default: all)}
+	Responses are {"ok": true, "boxes": {name: [x, y, w, h]}, "lost": {name: bool}}, plus
+	{"crops": {name: {"offset", "shape"}}} with the uint8 likelihood crops concatenated in the
+	payload if they were asked for, or {"ok": false, "error": message}."""
+	def __init__(self, workers: int = None, max_batch: int = 32, delay: float = 0.002) -> None:
+		from concurrent.futures import ThreadPoolExecutor
+		self.workers = workers or os.cpu_count()
+		self.pool = ThreadPoolExecutor(max_workers=self.workers)
+		self.max_batch = max_batch
+		self.delay = delay
+		self.sessions = {}
+		self.queue = None
+		self.clients = 0
+
+	async def batcher(self) -> None:
+		"""Collects waiting jobs into batches and runs them on the worker pool."""
+		loop = asyncio.get_running_loop()
+		while True:
+			batch = [await self.queue.get()]
+			# give concurrent requests a moment to join the batch
+			deadline = loop.time() + self.delay
+			while len(batch) < self.max_batch:
+				try: batch.append(await asyncio.wait_for(self.queue.get(), max(deadline - loop.time(), 0)))
+				except asyncio.TimeoutError: break
+
+			chunks = [batch[i::self.workers] for i in range(min(self.workers, len(batch)))]
+			for chunk, results in zip(chunks, await asyncio.gather(*(loop.run_in_executor(self.pool, run_jobs, chunk) for chunk in chunks))):
+				for job, result in zip(chunk, results):
+					if isinstance(result, Exception): job.future.set_exception(result)
+					else: job.future.set_result(result)
+
+	async def handle(self, header: dict, payload: bytes) -> tuple:
+		"""Answers a request, returns (header, payload) of the response."""
+		op = header.get("op")
+		if not op in ("start", "step", "stop"): raise Exception(f"Unknown op {op!r}")
+		key = header.get("session", "")
+		while True:
+			# only start creates sessions, so bad requests don't leave empty ones behind
+			session = self.sessions.get(key)
+			if session is None:
+				if op != "start": raise Exception(f"Unknown session {key!r}")
+				session = self.sessions[key] = Session(key)
+
+			# a session's requests run one at a time, in order
+			async with session.lock:
+				# a stop may have closed the session while this request waited for it
+				if self.sessions.get(key) is not session: continue
+				if op == "stop":
+					for name in header.get("trackers") or list(session.followers):
+						session.followers.pop(name, None)
+					if not session.followers: self.sessions.pop(key, None)
+					return ({"ok": True}, b"")
+				if op == "start":
+					session.start(header["trackers"])
+					names = list(header["trackers"])
+				else:
+					names = header.get("trackers") or list(session.followers)
+					missing = [name for name in names if not name in session.followers]
+					if missing: raise Exception(f"Unknown trackers {missing}")
+				job = Job(session, names, read_frame(header, payload), header.get("likelihood", False))
+				await self.queue.put(job)
+				return await job.future
+
+	async def client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		self.clients += 1
+		try:
+			while True:
+				message = await read_message(reader)
+				if message is None: break
+				try: response = await self.handle(*message)
+				except Exception as e: response = ({"ok": False, "error": str(e)}, b"")
+				writer.write(encode(*response))
+				await writer.drain()
+		finally:
+			self.clients -= 1
+			writer.close()
+
+	async def serve(self, path: str = None, host: str = "127.0.0.1", port: int = 8765) -> None:
+		"""Serves on the Unix socket <path> if it's given, on localhost TCP otherwise, until cancelled."""
+		self.queue = asyncio.Queue()
+		batcher = asyncio.create_task(self.batcher())
+		if path: server = await asyncio.start_unix_server(self.client, path)
+		else: server = await asyncio.start_server(self.client, host, port)
+		try:
+			async with server: await server.serve_forever()
+		finally:
+			batcher.cancel()
+			if path and os.path.exists(path): os.remove(path)
+
+class Client:
+	"""Blocking client of a TrackingService, for scripts that don't use asyncio."""
+	def __init__(self, path: str = None, host: str = "127.0.0.1", port: int = 8765, session: str = None) -> None:
+		import socket
+		if path:
+			self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			self.socket.connect(path)
+		else:
+			self.socket = socket.create_connection((host, port))
+		self.session = session or "%s-%d" % (socket.gethostname(), os.getpid())
+
+	def _receive(self, size: int) -> bytes:
+		data = bytearray()
+		while len(data) < size:
+			chunk = self.socket.recv(size - len(data))
+			if not chunk: raise ConnectionError("Connection closed by the service")
+			data += chunk
+		return bytes(data)
+
+	def request(self, header: dict, frame = None) -> tuple:
+		"""Sends a request, returns (header, payload) of the response."""
+		payload = b""
+		if frame is not None:
+			frame = np.ascontiguousarray(frame, dtype=np.uint8)
+			header = dict(header, shape=frame.shape)
+			payload = frame.tobytes()
+		self.socket.sendall(encode(dict(header, session=self.session), payload))
+		length, = HEADER.unpack(self._receive(HEADER.size))
+		response = json.loads(self._receive(length))
+		if not response["ok"]: raise Exception(response["error"])
+		return (response, self._receive(response.get("size", 0)))
+
+	def start(self, frame, trackers: dict) -> dict:
+		"""Starts trackers, {name: {"x", "y", "w", "h", "bg_margin", follower options...}}, on a frame."""
+		return self.request({"op": "start", "trackers": trackers}, frame)[0]
+
+	def step(self, frame, trackers: list = None, likelihood: bool = False) -> dict:
+		"""Tracks into the next frame, returns the response with "crops" holding {name: (array, (x, y))} if asked for."""
+		response, payload = self.request({"op": "step", "trackers": trackers, "likelihood": likelihood}, frame)
+		if likelihood:
+			position = 0
+			for name, crop in response["crops"].items():
+				h, w = crop["shape"]
+				response["crops"][name] = (np.frombuffer(payload, np.uint8, h * w, position).reshape(h, w), tuple(crop["offset"]))
+				position += h * w
+		return response
+
+	def stop(self, trackers: list = None) -> None:
+		self.request({"op": "stop", "trackers": trackers})
+
+	def close(self) -> None:
+		self.socket.close()
+
+if __name__ == "__main__":
+	import argparse
+	parser = argparse.ArgumentParser(description="Serve the tracker to local processes.")
+	parser.add_argument("--socket", default=None, help="Unix socket path (localhost TCP if it's not given)")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--workers", type=int, default=None)
+	parser.add_argument("--max-batch", type=int, default=32)
+	args = parser.parse_args()
+
+	service = TrackingService(args.workers, args.max_batch)
+	try: asyncio.run(service.serve(args.socket, port=args.port))
+	except KeyboardInterrupt: pass
@@ -0,0 +1,100 @@
+import numpy as np
+
+class SparseHistogram:
+	"""Histogram of only the occupied bins: sorted bin ids and their counts.
+
+	Used for joint colour models with many more bins than a tracker has pixels, where a dense
+	count array would be mostly zeros."""
+	def __init__(self, ids = None, counts = None) -> None:
+		self.ids = np.asarray(ids if ids is not None else [], dtype=np.intp)
+		self.counts = np.asarray(counts if counts is not None else [], dtype=float)
+
+	@classmethod
+	def from_values(cls, values, weights = None):
+		"""Counts (optionally weighted) bin ids."""
+		ids, inverse = np.unique(np.asarray(values).ravel(), return_inverse=True)
+		counts = np.bincount(inverse, weights=None if weights is None else np.asarray(weights).ravel(), minlength=len(ids))
+		return cls(ids, counts)
+
+	def lookup(self, ids, default: float = 0):
+		"""Returns the counts of the given bin ids, <default> for empty bins."""
+		return lookup(self.ids, self.counts, ids, default)
+
+	def _merge(self, other, sign: int):
+		ids = np.union1d(self.ids, other.ids)
+		return SparseHistogram(ids, self.lookup(ids) + sign * other.lookup(ids))
+
+	def __add__(self, other):
+		return self._merge(other, 1)
+
+	def __sub__(self, other):
+		result = self._merge(other, -1)
+		keep = result.counts != 0
+		return SparseHistogram(result.ids[keep], result.counts[keep])
+
+	def sum(self) -> float:
+		return float(self.counts.sum())
+
+	def to_dense(self, size: int):
+		"""Returns the histogram as a dense count array of the given size."""
+		dense = np.zeros(size)
+		dense[self.ids] = self.counts
+		return dense
+
+	def __len__(self) -> int:
+		return len(self.ids)
+
+	def __repr__(self) -> str:
+		return "SparseHistogram(bins: %d total: %g)" % (len(self.ids), self.sum())
+
+class SparseTable:
+	"""Lookup table over the occupied bins only, every other bin maps to <default>."""
+	def __init__(self, ids, values, default: float = 0) -> None:
+		self.ids = np.asarray(ids, dtype=np.intp)
+		self.values = np.asarray(values)
+		self.default = default
+
+	def __getitem__(self, ids):
+		return lookup(self.ids, self.values, ids, self.default)
+
+	def __len__(self) -> int:
+		return len(self.ids)
+
+def lookup(keys, values, ids, default: float = 0):
+	"""Returns values[keys == id] for every id, <default> where keys (sorted) doesn't contain it."""
+	ids = np.asarray(ids)
+	if not len(keys): return np.full(ids.shape, default, dtype=values.dtype if len(values) else float)
+	index = np.minimum(np.searchsorted(keys, ids), len(keys) - 1)
+	return np.where(keys[index] == ids, values[index], default)
+
+def region_counts(img, tracker, kernel = None) -> tuple:
+	"""Returns the sparse fg and bg histograms of a quantized image array under a tracker, like util.region_counts."""
+	from math import floor
+	from util import constrain_box
+
+	h, w = img.shape[:2]
+	fx1, fy1, fx2, fy2 = constrain_box(tracker.fg_coords(), w, h)
+	bx1, by1, bx2, by2 = constrain_box(tracker.bg_coords(), w, h)
+
+	fg_count = SparseHistogram.from_values(img[fy1:fy2, fx1:fx2])
+	bg_count = SparseHistogram.from_values(img[by1:by2, bx1:bx2]) - fg_count
+	if kernel is None: return (fg_count, bg_count)
+
+	# only use the part of the kernel that's inside the image
+	x1, y1, _, _ = tracker.fg_coords()
+	kx, ky = (fx1 - floor(x1), fy1 - floor(y1))
+	weights = kernel[ky:ky + fy2 - fy1, kx:kx + fx2 - fx1]
+	return (SparseHistogram.from_values(img[fy1:fy1 + weights.shape[0], fx1:fx1 + weights.shape[1]], weights), bg_count)
+
+def log_likelihood_ratios(fg_count: SparseHistogram, bg_count: SparseHistogram) -> SparseTable:
+	"""Returns util.log_likelihood_ratios materialized for the occupied bins only (empty bins have a ratio of 0)."""
+	from util import log_likelihood_ratios
+	# every occupied bin is in the union, so the frequencies stay relative to the whole histograms
+	ids = np.union1d(fg_count.ids, bg_count.ids)
+	return SparseTable(ids, log_likelihood_ratios(fg_count.lookup(ids), bg_count.lookup(ids)), 0)
+
+def likelihood(img, tracker, kernel = None):
+	"""Returns the 8-bit likelihood array of a quantized image array with any number of bins."""
+	from util import likelihood_table
+	table = log_likelihood_ratios(*region_counts(img, tracker, kernel))
+	return likelihood_table(table[img])
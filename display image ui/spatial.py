@@ -0,0 +1,57 @@
+from collections import defaultdict
+
+class GridIndex:
+	"""Uniform grid over object bounding boxes, for finding the objects under a point without checking all of them.
+
+	Objects keep the order they'd have in a list: insert(front=True) puts an object before every
+	other one, like list.insert(0, ...), otherwise it goes after them, like list.append(...)."""
+	def __init__(self, cell: int = 64) -> None:
+		self.cell = cell
+		self.cells = defaultdict(set)
+		self.boxes = {}
+		self.order = {}
+		self.first = 0
+		self.last = 0
+
+	def _cells(self, box: tuple):
+		x1, y1, x2, y2 = box
+		c = self.cell
+		for cx in range(int(min(x1, x2) // c), int(max(x1, x2) // c) + 1):
+			for cy in range(int(min(y1, y2) // c), int(max(y1, y2) // c) + 1):
+				yield (cx, cy)
+
+	def insert(self, obj, box: tuple, front: bool = False) -> None:
+		"""Adds an object with its (x1, y1, x2, y2) bounding box."""
+		if obj in self.boxes: self.remove(obj)
+		self.boxes[obj] = box
+		if front: self.first -= 1
+		else: self.last += 1
+		self.order[obj] = self.first if front else self.last
+		for cell in self._cells(box): self.cells[cell].add(obj)
+
+	def remove(self, obj) -> None:
+		"""Removes an object, if it's indexed."""
+		box = self.boxes.pop(obj, None)
+		if box is None: return
+		del self.order[obj]
+		for cell in self._cells(box):
+			self.cells[cell].discard(obj)
+			if not self.cells[cell]: del self.cells[cell]
+
+	def query(self, x: float, y: float) -> list:
+		"""Returns the objects whose bounding box contains the point (x, y), in order."""
+		candidates = self.cells.get((int(x // self.cell), int(y // self.cell)), ())
+		hits = []
+		for obj in candidates:
+			x1, y1, x2, y2 = self.boxes[obj]
+			if x >= min(x1, x2) and x <= max(x1, x2) and y >= min(y1, y2) and y <= max(y1, y2): hits.append(obj)
+		return sorted(hits, key=self.order.get)
+
+	def clear(self) -> None:
+		self.__init__(self.cell)
+
+	def __contains__(self, obj) -> bool:
+		return obj in self.boxes
+
+	def __len__(self) -> int:
+		return len(self.boxes)
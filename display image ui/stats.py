@@ -0,0 +1,192 @@
+import numpy as np
+
+class QuantileSketch:
+	"""Mergeable approximate quantiles: at most <capacity> weighted points standing for all the values seen.
+
+	When it grows past its capacity the points are sorted and pooled into <capacity> groups of equal
+	weight, so a quantile is off by about 1 / capacity in rank, however many values went in."""
+	def __init__(self, capacity: int = 512) -> None:
+		self.capacity = capacity
+		self.values = np.empty(0)
+		self.weights = np.empty(0)
+
+	def add(self, values, weights = None) -> None:
+		values = np.asarray(values, dtype=float).ravel()
+		weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float).ravel()
+		self.values = np.concatenate((self.values, values))
+		self.weights = np.concatenate((self.weights, weights))
+		if len(self.values) > self.capacity: self.compress()
+
+	def compress(self) -> None:
+		order = np.argsort(self.values, kind="stable")
+		values, weights = (self.values[order], self.weights[order])
+		# group the points by their cumulative weight and replace every group by its weighted mean
+		cumulative = np.cumsum(weights)
+		groups = np.minimum((cumulative - weights / 2) / cumulative[-1] * self.capacity, self.capacity - 1).astype(np.intp)
+		self.weights = np.bincount(groups, weights, self.capacity)
+		sums = np.bincount(groups, values * weights, self.capacity)
+		keep = self.weights > 0
+		self.weights = self.weights[keep]
+		self.values = sums[keep] / self.weights
+
+	def merge(self, other) -> None:
+		self.add(other.values, other.weights)
+
+	def quantile(self, q):
+		"""Returns the approximate q quantile(s), q between 0 and 1."""
+		if not len(self.values): return np.full(np.shape(q), np.nan) if np.ndim(q) else float("nan")
+		order = np.argsort(self.values, kind="stable")
+		values, weights = (self.values[order], self.weights[order])
+		positions = (np.cumsum(weights) - weights / 2) / weights.sum()
+		return np.interp(q, positions, values)
+
+class ValueRange:
+	"""Running minimum, maximum, mean, variance and quantiles of the values recorded so far.
+
+	record() takes a single value or an array of any shape. Partial results, e.g. from different
+	workers or frames, are combined with merge() or +."""
+	def __init__(self, capacity: int = 512) -> None:
+		self.min = None
+		self.max = None
+		self.count = 0
+		self.mean = 0.0
+		self.m2 = 0.0 # sum of squared differences from the mean
+		self.sketch = QuantileSketch(capacity)
+
+	def record(self, values) -> None:
+		values = np.asarray(values, dtype=float).ravel()
+		if not len(values): return
+		batch = ValueRange(self.sketch.capacity)
+		batch.min, batch.max = (float(values.min()), float(values.max()))
+		batch.count = len(values)
+		batch.mean = float(values.mean())
+		batch.m2 = float(((values - batch.mean) ** 2).sum())
+		batch.sketch.add(values)
+		self.merge(batch)
+
+	def merge(self, other) -> None:
+		"""Adds the values recorded by another ValueRange."""
+		if not other.count: return
+		if not self.count:
+			self.min, self.max, self.count, self.mean, self.m2 = (other.min, other.max, other.count, other.mean, other.m2)
+		else:
+			# Chan et al.'s pairwise update
+			count = self.count + other.count
+			delta = other.mean - self.mean
+			self.mean += delta * other.count / count
+			self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+			self.count = count
+			self.min, self.max = (min(self.min, other.min), max(self.max, other.max))
+		self.sketch.merge(other.sketch)
+
+	def __add__(self, other):
+		result = ValueRange(self.sketch.capacity)
+		result.merge(self)
+		result.merge(other)
+		return result
+
+	@property
+	def variance(self) -> float:
+		return self.m2 / self.count if self.count else float("nan")
+
+	@property
+	def std(self) -> float:
+		return self.variance ** 0.5
+
+	def percentile(self, p):
+		"""Returns the approximate p percentile(s), p between 0 and 100."""
+		return self.sketch.quantile(np.asarray(p) / 100)
+
+	def reset(self):
+		self.__init__(self.sketch.capacity)
+
+	def __str__(self) -> str:
+		return "(%.2f - %.2f)" % (self.min, self.max)
+
+	def __repr__(self) -> str:
+		return "ValueRange(min: %.2f max: %.2f mean: %.2f std: %.2f count: %d)" % (self.min, self.max, self.mean, self.std, self.count)
+
+class Histogram:
+	"""Counts of values between explicit bin edges, plus the counts below and above them.
+
+	Bin i holds edges[i] <= value < edges[i + 1], the last bin includes its upper edge, like
+	numpy.histogram. NaNs are counted in <missing>, infinities below or above the edges.
+	Histograms with the same edges are combined with merge() or +."""
+	def __init__(self, edges) -> None:
+		self.edges = np.asarray(edges, dtype=float)
+		if self.edges.ndim != 1 or len(self.edges) < 2 or not np.isfinite(self.edges).all() or (np.diff(self.edges) <= 0).any():
+			raise Exception("Histogram edges must be at least 2 finite, increasing values")
+		self.counts = np.zeros(len(self.edges) - 1)
+		self.below = 0
+		self.above = 0
+		self.missing = 0
+		steps = np.diff(self.edges)
+		self.uniform = bool(np.allclose(steps, steps[0]))
+
+	@classmethod
+	def uniform_bins(cls, bins: int, low: float, high: float):
+		return cls(np.linspace(low, high, bins + 1))
+
+	def bins(self, values):
+		"""Returns the bin of every value, -1 below the edges, len(counts) above them and len(counts) + 1 for NaN."""
+		values = np.atleast_1d(np.asarray(values, dtype=float))
+		n = len(self.counts)
+		missing = np.isnan(values)
+		if self.uniform:
+			# equal bins are found arithmetically instead of by a search
+			low, high = (self.edges[0], self.edges[-1])
+			index = np.floor((values - low) * (n / (high - low)))
+			index = np.clip(np.where(missing, 0, index), -1, n).astype(np.intp)
+			index[values == high] = n - 1
+			# undo rounding errors right at the edges
+			index[(index >= 0) & (index < n) & (values < self.edges[np.clip(index, 0, n - 1)])] -= 1
+			index[(index >= 0) & (index < n - 1) & (values >= self.edges[np.clip(index + 1, 0, n)])] += 1
+		else:
+			index = np.searchsorted(self.edges, values, side="right") - 1
+			index[values == self.edges[-1]] = n - 1
+		index[values < self.edges[0]] = -1
+		index[values > self.edges[-1]] = n
+		index[missing] = n + 1
+		return index
+
+	def add(self, values, weights = None) -> None:
+		values = np.asarray(values, dtype=float).ravel()
+		weights = None if weights is None else np.asarray(weights, dtype=float).ravel()
+		index = self.bins(values) + 1
+		n = len(self.counts)
+		counts = np.bincount(index, weights, n + 3)
+		self.below += counts[0]
+		self.counts += counts[1:n + 1]
+		self.above += counts[n + 1]
+		self.missing += counts[n + 2]
+
+	def merge(self, other) -> None:
+		if not np.array_equal(self.edges, other.edges): raise Exception("Can't merge histograms with different edges")
+		self.counts += other.counts
+		self.below += other.below
+		self.above += other.above
+		self.missing += other.missing
+
+	def __add__(self, other):
+		result = Histogram(self.edges)
+		result.merge(self)
+		result.merge(other)
+		return result
+
+	def total(self) -> float:
+		return float(self.counts.sum())
+
+	def frequencies(self):
+		"""Returns the counts divided by their total."""
+		total = self.total()
+		return self.counts / total if total else self.counts.copy()
+
+	def mode(self) -> int:
+		"""Returns the bin with the highest count."""
+		return int(self.counts.argmax())
+
+	def __len__(self) -> int:
+		return len(self.counts)
+
+	def __repr__(self) -> str:
+		return "Histogram(bins: %d range: %g - %g total: %g)" % (len(self.counts), self.edges[0], self.edges[-1], self.total())
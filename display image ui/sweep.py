@@ -0,0 +1,112 @@
+import csv
+import os
+from itertools import product
+
+# default parameter grid
+GRID = {
+	"bg_margin":   [10, 20, 30, 50],
+	"color_count": [16, 32, 64],
+	"mode":        ["RGB"],
+	"feature":     ["mean"],
+}
+COLUMNS = ("scene", "tracker", "bg_margin", "color_count", "mode", "feature", "score", "bhattacharyya", "fg_mean", "bg_mean", "auc")
+
+def feature_name(feature) -> str:
+	"""Returns the name of a feature as it's written to the results table."""
+	return feature if isinstance(feature, str) else ",".join(str(w) for w in feature)
+
+def parse_features(names: list) -> list:
+	"""Returns the features from their names: "mean", "all" (every paper feature) or "w1,w2,w3"."""
+	from util import feature_weights
+	features = []
+	for name in names:
+		if name == "mean": features.append("mean")
+		elif name == "all": features += feature_weights()
+		else: features.append(tuple(int(w) for w in name.split(",")))
+	return features
+
+def _evaluate(path: str, cache_root: str, trackers: list, mode: str, color_count: int, feature, margins: list) -> list:
+	"""Scores one quantization of a frame for every tracker and bg margin, run in a worker."""
+	from framecache import FrameCache
+	from metrics import histogram_metrics
+	from util import quantize_feature, region_counts
+
+	cache = FrameCache(cache_root)
+	if feature == "mean":
+		# mean features are shared between jobs through the quantized plane cache
+		img = cache.quantized(path, mode, color_count)
+	else:
+		img = quantize_feature(cache.rgb(path), feature, color_count)
+
+	rows = []
+	for i, tracker in enumerate(trackers):
+		for bg_margin in margins:
+			t = tracker.offset(0, 0)
+			t.set(bg_margin=bg_margin)
+			fg_count, bg_count = region_counts(img, t, color_count)
+			m = histogram_metrics(fg_count, bg_count)
+			rows.append((i, bg_margin, m.variance_ratio, m.bhattacharyya, m.fg_mean, m.bg_mean, m.auc))
+	return rows
+
+def sweep(scene: str, grid: dict = None, out_path: str = None, workers: int = None, scene_file: str = None, cache = None) -> list:
+	"""Scores every parameter combination of a scene's trackers in parallel and returns the rows best-first.
+	The score is the variance ratio, the remaining separability metrics are kept alongside it.
+
+	Jobs are split by quantization (mode, color count and feature), so every worker quantizes the
+	frame once and scores all bg margins on it. Weighted features ignore the mode, their rows have
+	"-" as their mode. Decoded and quantized frames are shared between
+	workers through the frame cache. If out_path is given, the rows are written there as CSV."""
+	from concurrent.futures import ProcessPoolExecutor
+	from framecache import FrameCache
+	from scene import read_scene
+	from util import constrain
+
+	grid = {**GRID, **(grid or {})}
+	path, trackers = read_scene(scene, scene_file)
+	cache = cache or FrameCache()
+	cache.rgb(path) # decode once before the workers start
+
+	# split the jobs by quantization
+	# weighted features don't depend on the mode, so they're only scored once per color count
+	color_counts = [int(constrain(c, 1, 255)) for c in grid["color_count"]]
+	features = [f for f in grid["feature"] if f != "mean"]
+	jobs = list(product(grid["mode"], color_counts, ["mean"] if "mean" in grid["feature"] else []))
+	jobs += list(product(["-"], color_counts, features))
+	rows = []
+	with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+		futures = [pool.submit(_evaluate, path, cache.root, trackers, mode, color_count, feature, grid["bg_margin"]) for mode, color_count, feature in jobs]
+		for (mode, color_count, feature), future in zip(jobs, futures):
+			for i, bg_margin, *scores in future.result():
+				rows.append((scene.upper(), i, bg_margin, color_count, mode, feature_name(feature), *scores))
+
+	# sort the results best-first and write them
+	rows.sort(key=lambda row: -row[6])
+	if out_path:
+		with open(out_path, "w", newline="") as file:
+			writer = csv.writer(file)
+			writer.writerow(COLUMNS)
+			writer.writerows(rows)
+	return rows
+
+if __name__ == "__main__":
+	import argparse
+	parser = argparse.ArgumentParser(description="Score likelihood parameters of saved scenes.")
+	parser.add_argument("scenes", nargs="+", help="names of the scenes in objects.json")
+	parser.add_argument("--bg-margin", nargs="+", type=int, default=GRID["bg_margin"])
+	parser.add_argument("--color-count", nargs="+", type=int, default=GRID["color_count"])
+	parser.add_argument("--mode", nargs="+", default=GRID["mode"])
+	parser.add_argument("--feature", nargs="+", default=GRID["feature"], help='"mean", "all" or "w1,w2,w3"')
+	parser.add_argument("--workers", type=int, default=None)
+	parser.add_argument("--out", default="sweep.csv")
+	args = parser.parse_args()
+
+	grid = {"bg_margin": args.bg_margin, "color_count": args.color_count, "mode": args.mode, "feature": parse_features(args.feature)}
+	rows = []
+	for name in args.scenes:
+		rows += sweep(name, grid, workers=args.workers)
+	rows.sort(key=lambda row: -row[6])
+	with open(args.out, "w", newline="") as file:
+		writer = csv.writer(file)
+		writer.writerow(COLUMNS)
+		writer.writerows(rows)
+	print(f"wrote {len(rows)} results to {args.out}")
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+
+class SyntheticSequence:
+	"""A deterministic sequence of moving blobs over a cluttered background, with ground truth.
+
+	Frames are generated on demand, so sequences of any resolution and length cost no storage.
+	Every frame only depends on the seed and its index, so frame i is the same however it's reached."""
+	def __init__(self, width: int = 640, height: int = 480, length: int = 100, targets: int = 1, seed: int = 0, size: tuple = (40, 60), speed: float = 4, clutter: int = 200, noise: int = 8, textured: bool = False) -> None:
+		self.width    = width
+		self.height   = height
+		self.length   = length
+		self.seed     = seed
+		self.noise    = noise
+		rng = np.random.default_rng(seed)
+
+		# background: random rectangles of random colours
+		self.background = np.empty((height, width, 3), dtype=np.uint8)
+		self.background[...] = rng.integers(0, 256, 3)
+		for _ in range(clutter):
+			x, y = (rng.integers(0, width), rng.integers(0, height))
+			w, h = (rng.integers(4, max(width // 8, 5)), rng.integers(4, max(height // 8, 5)))
+			self.background[y:y+h, x:x+w] = rng.integers(0, 256, 3)
+
+		# targets: an elliptic blob each, either flat or striped
+		self.sizes = [(int(size[0] * s), int(size[1] * s)) for s in rng.uniform(0.75, 1.25, targets)]
+		self.blobs = []
+		for w, h in self.sizes:
+			yy, xx = np.ogrid[:h, :w]
+			mask = ((xx + 0.5) / w * 2 - 1) ** 2 + ((yy + 0.5) / h * 2 - 1) ** 2 <= 1
+			colour = rng.integers(0, 256, 3)
+			blob = np.broadcast_to(colour, (h, w, 3)).copy()
+			if textured: blob[(xx + yy) // 4 % 2 == 1] = 255 - colour
+			self.blobs.append((mask, blob.astype(np.uint8)))
+
+		# trajectories: constant velocity, bouncing off the frame edges
+		self.positions = np.empty((length, targets, 2))
+		for t, (w, h) in enumerate(self.sizes):
+			position = rng.uniform((0, 0), (width - w, height - h))
+			angle = rng.uniform(0, 2 * np.pi)
+			velocity = np.array([np.cos(angle), np.sin(angle)]) * speed
+			for i in range(length):
+				self.positions[i, t] = position
+				position = position + velocity
+				for axis, limit in enumerate((width - w, height - h)):
+					if position[axis] < 0 or position[axis] > limit:
+						velocity[axis] = -velocity[axis]
+						position[axis] = min(max(position[axis], 0), limit)
+
+	def __len__(self) -> int:
+		return self.length
+
+	def box(self, index: int, target: int = 0) -> tuple:
+		"""Returns the (x, y, w, h) ground truth box of a target in a frame."""
+		x, y = self.positions[index, target]
+		return (int(x), int(y)) + self.sizes[target]
+
+	@property
+	def boxes(self) -> list:
+		"""The ground truth boxes of the first target."""
+		return [self.box(i) for i in range(self.length)]
+
+	def __getitem__(self, index: int):
+		"""Returns the RGB array of a frame."""
+		if index < 0 or index >= self.length: raise IndexError(index)
+		frame = self.background.copy()
+		for t, (mask, blob) in enumerate(self.blobs):
+			x, y, w, h = self.box(index, t)
+			frame[y:y+h, x:x+w][mask] = blob[mask]
+		if self.noise:
+			rng = np.random.default_rng((self.seed, index))
+			frame = np.clip(frame.astype(np.int16) + rng.integers(-self.noise, self.noise + 1, frame.shape, dtype=np.int16), 0, 255).astype(np.uint8)
+		return frame
+
+	def __iter__(self):
+		for i in range(self.length):
+			yield self[i]
+
+def write_sequence(path: str, **kwargs) -> SyntheticSequence:
+	"""Writes a synthetic sequence as numbered PNG frames with a groundtruth.txt per target (groundtruth_1.txt, ... for the others)."""
+	from PIL import Image
+	from sequence import write_boxes
+
+	sequence = SyntheticSequence(**kwargs)
+	os.makedirs(path, exist_ok=True)
+	for i, frame in enumerate(sequence):
+		Image.fromarray(frame).save(os.path.join(path, "%06d.png" % i))
+	for t in range(len(sequence.sizes)):
+		write_boxes(os.path.join(path, "groundtruth.txt" if not t else "groundtruth_%d.txt" % t), [sequence.box(i, t) for i in range(len(sequence))])
+	return sequence
+
+if __name__ == "__main__":
+	import argparse
+	parser = argparse.ArgumentParser(description="Write a synthetic tracking sequence with ground truth.")
+	parser.add_argument("path")
+	parser.add_argument("--width", type=int, default=640)
+	parser.add_argument("--height", type=int, default=480)
+	parser.add_argument("--length", type=int, default=100)
+	parser.add_argument("--targets", type=int, default=1)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--speed", type=float, default=4)
+	parser.add_argument("--textured", action="store_true")
+	args = parser.parse_args()
+	write_sequence(args.path, width=args.width, height=args.height, length=args.length, targets=args.targets, seed=args.seed, speed=args.speed, textured=args.textured)
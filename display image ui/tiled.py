@@ -0,0 +1,85 @@
+import os
+import numpy as np
+
+def open_rgb(src, path: str = None, cache = None):
+	"""Returns a read-only memory-mapped RGB array for an image file, PIL image or .npy file.
+
+	PIL images are written to the .npy file <path> first."""
+	from framecache import FrameCache
+
+	# .npy files are already decoded, just map them
+	if isinstance(src, str) and src.endswith(".npy"):
+		return np.load(src, mmap_mode="r")
+
+	# image files are decoded once into the frame cache
+	if isinstance(src, str):
+		return (cache or FrameCache()).rgb(src)
+
+	# PIL images are written to an .npy file so workers can map it
+	image = src.convert("RGB")
+	arr = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(image.height, image.width, 3))
+	arr[...] = np.asarray(image)
+	arr.flush()
+	del arr
+	return np.load(path, mmap_mode="r")
+
+def tracker_table(rgb, tracker, mode: str = "RGB", color_count: int = 64):
+	"""Returns the likelihood lookup table of a tracker, computed from its bg window only."""
+	from util import constrain_box, quantize, region_counts, log_likelihood_ratios, likelihood_table
+
+	h, w = rgb.shape[:2]
+	x1, y1, x2, y2 = constrain_box(tracker.bg_coords(), w, h)
+
+	# only quantize the window, then count relative to it
+	window = quantize(rgb[y1:y2, x1:x2], mode, color_count)
+	fg_count, bg_count = region_counts(window, tracker.offset(x1, y1), color_count)
+	return likelihood_table(log_likelihood_ratios(fg_count, bg_count))
+
+def tiles(width: int, height: int, tile_size: int) -> list:
+	"""Returns a list of (x1, y1, x2, y2) tiles covering an image."""
+	return [(x, y, min(x + tile_size, width), min(y + tile_size, height)) for y in range(0, height, tile_size) for x in range(0, width, tile_size)]
+
+def _likelihood_tile(src: str, dst: str, tile: tuple, table, mode: str, color_count: int) -> None:
+	from util import quantize
+	x1, y1, x2, y2 = tile
+	rgb = np.load(src, mmap_mode="r")
+	out = np.load(dst, mmap_mode="r+")
+	out[y1:y2, x1:x2] = table[quantize(rgb[y1:y2, x1:x2], mode, color_count)]
+	out.flush()
+
+def likelihood_tiled(src, tracker, out_path: str, mode: str = "RGB", color_count: int = 64, tile_size: int = 1024, workers: int = None, cache = None):
+	"""Computes a likelihood image tile by tile over a process pool and returns it memory-mapped from out_path.
+
+	The histograms are computed once from the tracker region, every worker then maps the
+	decoded source and the output file and only ever holds a single tile in memory."""
+	from concurrent.futures import ProcessPoolExecutor
+	from util import any_eq, constrain
+
+	# constrain the color count
+	color_count = int(constrain(color_count, 1, 255))
+	if not any_eq("RGB", mode.upper()): return
+
+	# make sure the source is an .npy file the workers can map, PIL images go to a temporary one
+	tmp = None
+	if not isinstance(src, str):
+		from tempfile import mkstemp
+		fd, tmp = mkstemp(suffix=".rgb.npy", dir=os.path.dirname(os.path.abspath(out_path)))
+		os.close(fd)
+	try:
+		rgb = open_rgb(src, tmp, cache)
+		h, w = rgb.shape[:2]
+		table = tracker_table(rgb, tracker, mode, color_count)
+
+		# create the on-disk result
+		out = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.uint8, shape=(h, w))
+		del out
+
+		# apply the table to every tile in parallel
+		jobs = tiles(w, h, tile_size)
+		with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+			list(pool.map(_likelihood_tile, [rgb.filename] * len(jobs), [out_path] * len(jobs), jobs, [table] * len(jobs), [mode] * len(jobs), [color_count] * len(jobs), chunksize=max(1, len(jobs) // (4 * (workers or os.cpu_count())))))
+		del rgb
+	finally:
+		if tmp and os.path.exists(tmp): os.remove(tmp)
+
+	return np.load(out_path, mmap_mode="r")
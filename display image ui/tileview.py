@@ -0,0 +1,235 @@
+import tkinter as tk
+from collections import OrderedDict
+from math import ceil, floor, log2
+import numpy as np
+
+class TileCache:
+	"""LRU cache of rendered tiles with a memory cap."""
+	def __init__(self, max_bytes: int = 64 << 20) -> None:
+		self.max_bytes = max_bytes
+		self.bytes = 0
+		self.tiles = OrderedDict()
+
+	def get(self, key):
+		tile = self.tiles.get(key)
+		if tile is not None: self.tiles.move_to_end(key)
+		return tile and tile[0]
+
+	def put(self, key, tile, nbytes: int) -> None:
+		if key in self.tiles: self.bytes -= self.tiles.pop(key)[1]
+		self.tiles[key] = (tile, nbytes)
+		self.bytes += nbytes
+		# drop the least recently used tiles until we fit again
+		while self.bytes > self.max_bytes and len(self.tiles) > 1:
+			self.bytes -= self.tiles.popitem(last=False)[1][1]
+
+	def clear(self) -> None:
+		self.tiles.clear()
+		self.bytes = 0
+
+tile_cache = TileCache()
+
+class TileLayer:
+	"""An image shown on a canvas as tiles, decoded on demand from a level-of-detail pyramid.
+
+	The source is an (H, W) or (H, W, 3) array, usually memory-mapped from the frame cache, so
+	only the visible tiles are ever read. Level k samples every 2**k-th pixel, and the level is
+	picked from the zoom, so a zoomed-out view of a huge image reads few pixels."""
+	count = 0
+
+	def __init__(self, source, tile: int = 256, cache: TileCache = None) -> None:
+		self.source = source
+		self.height, self.width = source.shape[:2]
+		self.tile = tile
+		self.cache = cache or tile_cache
+		self.x = 0
+		self.y = 0
+		self.zoom = 1
+		self.items = {}  # tile key -> canvas item
+		self.photos = {} # tile key -> PhotoImage of the items, kept alive while they're shown
+		# the tag is never reused, so it also keys the layer's tiles in the cache
+		TileLayer.count += 1
+		self.tag = "tiles%d" % TileLayer.count
+
+	@classmethod
+	def from_file(cls, filepath: str, frame_cache = None, **kwargs):
+		from framecache import load_frame
+		return cls(load_frame(filepath, frame_cache), **kwargs)
+
+	def level(self) -> int:
+		return max(0, floor(log2(1 / self.zoom))) if self.zoom < 1 else 0
+
+	def _photo(self, key: tuple, level: int, tx: int, ty: int, size: int):
+		from PIL import Image, ImageTk
+		photo = self.cache.get(key)
+		if photo is not None: return photo
+
+		# sample the tile from the source at the level's resolution
+		step = 1 << level
+		region = np.ascontiguousarray(self.source[ty*size:(ty+1)*size:step, tx*size:(tx+1)*size:step])
+		image = Image.fromarray(region.astype(np.uint8))
+
+		# scale it to its size on screen
+		w = ceil(min(size, self.width - tx*size) * self.zoom)
+		h = ceil(min(size, self.height - ty*size) * self.zoom)
+		if image.size != (w, h): image = image.resize((max(w, 1), max(h, 1)), Image.NEAREST if self.zoom > 1 else Image.BILINEAR)
+		photo = ImageTk.PhotoImage(image)
+		self.cache.put(key, photo, w * h * 4)
+		return photo
+
+	def render(self, canvas: tk.Canvas) -> None:
+		"""Shows the tiles that are visible on the canvas and removes the rest."""
+		level = self.level()
+		size = self.tile << level # tile size in source pixels
+		shown = size * self.zoom  # tile size on screen
+
+		# visible part of the canvas, in tile coordinates
+		vx1, vy1 = (canvas.canvasx(0), canvas.canvasy(0))
+		vx2, vy2 = (vx1 + canvas.winfo_width(), vy1 + canvas.winfo_height())
+		tx1 = max(int((vx1 - self.x) // shown), 0)
+		ty1 = max(int((vy1 - self.y) // shown), 0)
+		tx2 = min(int((vx2 - self.x) // shown), ceil(self.width / size) - 1)
+		ty2 = min(int((vy2 - self.y) // shown), ceil(self.height / size) - 1)
+
+		visible = set()
+		for ty in range(ty1, ty2 + 1):
+			for tx in range(tx1, tx2 + 1):
+				key = (self.tag, level, self.zoom, tx, ty)
+				visible.add(key)
+				if key in self.items: continue
+				self.photos[key] = self._photo(key, level, tx, ty, size)
+				self.items[key] = canvas.create_image(self.x + tx * shown, self.y + ty * shown, image=self.photos[key], anchor="nw", tags=(self.tag,))
+				canvas.tag_lower(self.items[key])
+
+		for key in list(self.items):
+			if key in visible: continue
+			canvas.delete(self.items.pop(key))
+			del self.photos[key]
+
+	def move(self, canvas: tk.Canvas, x: float, y: float) -> None:
+		"""Moves the image's top left corner to (x, y)."""
+		canvas.move(self.tag, x - self.x, y - self.y)
+		self.x, self.y = (x, y)
+		self.render(canvas)
+
+	def set_zoom(self, canvas: tk.Canvas, zoom: float, px: float, py: float) -> None:
+		"""Zooms the image, keeping the point (px, py) of the canvas where it is."""
+		u, v = ((px - self.x) / self.zoom, (py - self.y) / self.zoom)
+		self.zoom = zoom
+		self.x, self.y = (px - u * zoom, py - v * zoom)
+		self.delete(canvas)
+		self.render(canvas)
+
+	def delete(self, canvas: tk.Canvas) -> None:
+		canvas.delete(self.tag)
+		self.items.clear()
+		self.photos.clear()
+
+class TileViewer(tk.Canvas):
+	"""Canvas showing a single tiled image, panned by dragging and zoomed with the mouse wheel."""
+	def __init__(self, parent, source, min_zoom: float = 1/64, max_zoom: float = 16, **kwargs) -> None:
+		super().__init__(parent, **kwargs)
+		self.layer = TileLayer(np.asarray(source))
+		self.min_zoom = min_zoom
+		self.max_zoom = max_zoom
+		self.bind("<Configure>", lambda e: self.layer.render(self))
+		self.bind("<ButtonPress-1>", lambda e: self.scan_mark(e.x, e.y))
+		self.bind("<B1-Motion>", self.pan)
+		self.bind("<MouseWheel>", lambda e: self.zoom(e, 1 if e.delta > 0 else -1))
+		self.bind("<Button-4>", lambda e: self.zoom(e, 1))
+		self.bind("<Button-5>", lambda e: self.zoom(e, -1))
+
+	def pan(self, event) -> None:
+		self.scan_dragto(event.x, event.y, gain=1)
+		self.layer.render(self)
+
+	def zoom(self, event, direction: int) -> None:
+		zoom = min(max(self.layer.zoom * (1.25 if direction > 0 else 0.8), self.min_zoom), self.max_zoom)
+		self.layer.set_zoom(self, zoom, self.canvasx(event.x), self.canvasy(event.y))
+
+class SceneCanvas(tk.Canvas):
+	"""Canvas drawn in scene coordinates, panned by dragging with the middle (or right) button and zoomed with the wheel.
+
+	Shapes are created and read back in scene pixels, which coords() and create_*() map to the
+	canvas as scene * zoom + offset, so what's saved stays in image pixels whatever the view. The
+	TileLayers in <layers> are kept at the same zoom and placed with place_layer(). Zooming generates
+	a <<Zoom>> event, for anything sized in screen pixels to be redrawn."""
+	def __init__(self, parent, layers: dict, min_zoom: float = 1/16, max_zoom: float = 16, **kwargs) -> None:
+		super().__init__(parent, **kwargs)
+		self.layers = layers
+		self.min_zoom = min_zoom
+		self.max_zoom = max_zoom
+		self.zoom = 1
+		self.offset = (0, 0)
+		self.bind("<Configure>", lambda e: self.render())
+		for button in (2, 3):
+			self.bind(f"<ButtonPress-{button}>", self.start_pan)
+			self.bind(f"<B{button}-Motion>", self.pan)
+		self.bind("<MouseWheel>", lambda e: self.set_zoom(self.zoom * (1.25 if e.delta > 0 else 0.8), e.x, e.y))
+		self.bind("<Button-4>", lambda e: self.set_zoom(self.zoom * 1.25, e.x, e.y))
+		self.bind("<Button-5>", lambda e: self.set_zoom(self.zoom * 0.8, e.x, e.y))
+
+	def to_canvas(self, x: float, y: float) -> tuple:
+		"""Returns the canvas point of the scene point (x, y)."""
+		return (x * self.zoom + self.offset[0], y * self.zoom + self.offset[1])
+
+	def to_scene(self, x: float, y: float) -> tuple:
+		"""Returns the scene point under the window point (x, y), e.g. of a mouse event."""
+		return ((self.canvasx(x) - self.offset[0]) / self.zoom, (self.canvasy(y) - self.offset[1]) / self.zoom)
+
+	def _scale(self, args) -> list:
+		if len(args) == 1 and isinstance(args[0], (list, tuple)): args = args[0]
+		return [v * self.zoom + self.offset[i % 2] for i, v in enumerate(args)]
+
+	def coords(self, item, *args):
+		"""Sets or returns the coordinates of an item, in scene pixels."""
+		if not args: return [(v - self.offset[i % 2]) / self.zoom for i, v in enumerate(super().coords(item))]
+		return super().coords(item, *self._scale(args))
+
+	def create_line(self, *args, **kwargs) -> int:
+		return super().create_line(*self._scale(args), **kwargs)
+
+	def create_rectangle(self, *args, **kwargs) -> int:
+		return super().create_rectangle(*self._scale(args), **kwargs)
+
+	def place_layer(self, layer: TileLayer, x: float, y: float) -> None:
+		"""Moves a tile layer's top left corner to the scene point (x, y)."""
+		# layers are positioned in canvas pixels and zoomed on their own
+		if layer.zoom != self.zoom:
+			layer.delete(self)
+			layer.zoom = self.zoom
+		layer.move(self, *self.to_canvas(x, y))
+
+	def render(self) -> None:
+		for layer in self.layers.values(): layer.render(self)
+
+	def update_region(self) -> None:
+		"""Lets the view pan over every layer and shape, and the part of the canvas shown now."""
+		vx, vy = (self.canvasx(0), self.canvasy(0))
+		boxes = [(vx, vy, vx + self.winfo_width(), vy + self.winfo_height())]
+		boxes += [(layer.x, layer.y, layer.x + layer.width * layer.zoom, layer.y + layer.height * layer.zoom) for layer in self.layers.values()]
+		if self.bbox("all"): boxes.append(self.bbox("all"))
+		x1, y1, x2, y2 = zip(*boxes)
+		self.config(scrollregion=(min(x1), min(y1), max(x2), max(y2)))
+
+	def start_pan(self, event) -> None:
+		self.update_region()
+		self.scan_mark(event.x, event.y)
+
+	def pan(self, event) -> None:
+		# scrolling leaves the canvas coordinates, and so the scene ones, where they are
+		self.scan_dragto(event.x, event.y, gain=1)
+		self.render()
+
+	def set_zoom(self, zoom: float, x: float, y: float) -> None:
+		"""Zooms the view, keeping the window point (x, y) where it is."""
+		zoom = min(max(zoom, self.min_zoom), self.max_zoom)
+		px, py = (self.canvasx(x), self.canvasy(y))
+		f = zoom / self.zoom
+		# shapes are scaled by tk, layers re-render their tiles at the new level
+		self.scale("all", px, py, f, f)
+		self.offset = (px + (self.offset[0] - px) * f, py + (self.offset[1] - py) * f)
+		self.zoom = zoom
+		for layer in self.layers.values(): layer.set_zoom(self, zoom, px, py)
+		self.update_region()
+		self.event_generate("<<Zoom>>")
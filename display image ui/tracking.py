@@ -0,0 +1,291 @@
+import numpy as np
+from functools import lru_cache
+from tracker import Tracker
+import logsink
+
+@lru_cache(maxsize=64)
+def epanechnikov(width: int, height: int):
+	"""Returns the (height, width) Epanechnikov kernel mask of a fg box, cached per box size."""
+	y, x = np.ogrid[:height, :width]
+	r = ((x + 0.5) / width * 2 - 1) ** 2 + ((y + 0.5) / height * 2 - 1) ** 2
+	kernel = np.maximum(1 - r, 0)
+	kernel.setflags(write=False)
+	return kernel
+
+class Model:
+	"""Appearance model of a tracker: its fg and bg histograms and the log likelihood ratios derived from them.
+
+	Pixels are binned by util.quantize (mode, color_count), or by a quantizer.Quantizer if one is
+	given. A quantizer can also be "kmeans" or "median_cut", to learn a palette from the bg region.
+	Models with more than SPARSE_BINS bins keep sparse histograms (see sparse.py)."""
+	SPARSE_BINS = 4096
+
+	def __init__(self, mode: str = "RGB", color_count: int = 64, kernel: bool = False, quantizer = None) -> None:
+		from util import constrain
+		self.mode = mode
+		self.color_count = int(constrain(color_count, 1, 255))
+		self.kernel = kernel
+		self.quantizer = quantizer
+		if quantizer is not None and not isinstance(quantizer, str): self.color_count = quantizer.color_count
+		self.fg_count = None
+		self.bg_count = None
+		self.ratios = None
+
+	def quantize(self, img, workspace = None):
+		"""Returns the quantized image array, written into the workspace's buffers if one is given."""
+		from util import quantize
+		if self.quantizer is not None:
+			return workspace.lookup(self.quantizer, img) if workspace else self.quantizer(img)
+		if workspace: return workspace.quantize(img, self.mode, self.color_count)
+		return quantize(img, self.mode, self.color_count)
+
+	def learn(self, img, tracker: Tracker) -> None:
+		"""Learns the quantizer's palette from the tracker's bg region of an RGB image array, if it has to be learned."""
+		if not isinstance(self.quantizer, str): return
+		from quantizer import Quantizer, region_pixels
+		self.quantizer = getattr(Quantizer, self.quantizer)(region_pixels(img, tracker))
+		self.color_count = self.quantizer.color_count
+
+	def mask(self, tracker: Tracker):
+		"""Returns the kernel mask of the tracker's fg box, or None if the fg pixels aren't weighted."""
+		return epanechnikov(tracker.width, tracker.height) if self.kernel else None
+
+	def counts(self, img, tracker: Tracker) -> tuple:
+		"""Returns the fg and bg histograms of a quantized image array under the tracker."""
+		from util import region_counts
+		if self.sparse:
+			import sparse
+			return sparse.region_counts(img, tracker, self.mask(tracker))
+		return region_counts(img, tracker, self.color_count, self.mask(tracker))
+
+	@property
+	def sparse(self) -> bool:
+		return self.color_count + 1 > self.SPARSE_BINS
+
+	def aligned(self, fg_count, bg_count) -> tuple:
+		"""Returns (fg counts, bg counts, ratios) as dense arrays over the same bins."""
+		if not self.sparse: return (fg_count, bg_count, self.ratios)
+		from numpy import union1d
+		ids = union1d(fg_count.ids, bg_count.ids)
+		return (fg_count.lookup(ids), bg_count.lookup(ids), self.ratios[ids])
+
+	def fit(self, img, tracker: Tracker) -> None:
+		"""Builds the histograms from a quantized image array under the tracker."""
+		from util import log_likelihood_ratios
+		self.fg_count, self.bg_count = self.counts(img, tracker)
+		if self.sparse:
+			import sparse
+			self.ratios = sparse.log_likelihood_ratios(self.fg_count, self.bg_count)
+		else:
+			self.ratios = log_likelihood_ratios(self.fg_count, self.bg_count)
+
+	def weights(self, img, workspace = None):
+		"""Returns the log likelihood ratio of every pixel of a quantized image array."""
+		if workspace and not self.sparse: return workspace.remap(self.ratios, img, "weights")
+		return self.ratios[img]
+
+def move_to(tracker: Tracker, x1: float, y1: float) -> Tracker:
+	"""Returns a copy of the tracker with its fg box's top left corner moved to (x1, y1)."""
+	fx1, fy1, _, _ = tracker.fg_coords()
+	return tracker.offset(int(round(fx1 - x1)), int(round(fy1 - y1)))
+
+def center(tracker: Tracker) -> tuple:
+	"""Returns the center (x, y) of the tracker's fg box."""
+	x1, y1, x2, y2 = tracker.fg_coords()
+	return ((x1 + x2) / 2, (y1 + y2) / 2)
+
+def move_center(tracker: Tracker, x: float, y: float) -> Tracker:
+	"""Returns a copy of the tracker with its fg box centered at (x, y)."""
+	x1, y1, x2, y2 = tracker.fg_coords()
+	return move_to(tracker, x - (x2 - x1) / 2, y - (y2 - y1) / 2)
+
+def mean_shift(weights, tracker: Tracker, iterations: int = 10, epsilon: float = 1, kernel = None) -> tuple:
+	"""Moves the tracker's fg box to the centroid of the positive weights under it until it settles.
+
+	With a kernel mask only the weights inside the kernel's support count. Returns (tracker, iterations used)."""
+	from util import constrain_box
+	from math import floor
+	h, w = weights.shape[:2]
+	for i in range(iterations):
+		x1, y1, x2, y2 = constrain_box(tracker.fg_coords(), w, h)
+		box = np.maximum(weights[y1:y2, x1:x2], 0)
+		if kernel is not None:
+			fx1, fy1, _, _ = tracker.fg_coords()
+			kx, ky = (x1 - floor(fx1), y1 - floor(fy1))
+			support = kernel[ky:ky + y2 - y1, kx:kx + x2 - x1] > 0
+			box = box[:support.shape[0], :support.shape[1]] * support
+			x2, y2 = (x1 + box.shape[1], y1 + box.shape[0])
+		total = box.sum()
+		if not total: return (tracker, i)
+
+		# move the box's center onto the weighted centroid
+		dx = (box.sum(0) * np.arange(x1, x2)).sum() / total - (x1 + x2 - 1) / 2
+		dy = (box.sum(1) * np.arange(y1, y2)).sum() / total - (y1 + y2 - 1) / 2
+		fx1, fy1, _, _ = tracker.fg_coords()
+		tracker = move_to(tracker, fx1 + dx, fy1 + dy)
+		if abs(dx) < epsilon and abs(dy) < epsilon: return (tracker, i + 1)
+	return (tracker, iterations)
+
+class TemporalFilter:
+	"""Running float32 average of a follower's weights, kept over its search window.
+
+	Every frame the previous map is moved by the given offset (the tracker's predicted motion
+	and the camera shift), and where it overlaps the new window it's blended in place with
+	the new weights as <alpha> * new + (1 - alpha) * previous. Outside the overlap the new
+	weights are used as they are. Two buffers of a workspace are used in turn, so there are
+	no per-frame allocations."""
+	def __init__(self, alpha: float = 0.5, workspace = None) -> None:
+		from workspace import Workspace
+		self.alpha = alpha
+		self.workspace = workspace or Workspace()
+		self.map = None
+		self.origin = None # window's top left corner in the frame
+		self.velocity = (0, 0)
+		self.turn = 0
+
+	def reset(self) -> None:
+		self.map = None
+		self.velocity = (0, 0)
+
+	def move(self, dx: float, dy: float) -> None:
+		"""Moves the previous map by (dx, dy) pixels."""
+		if self.map is not None: self.origin = (self.origin[0] + dx, self.origin[1] + dy)
+
+	def update(self, weights, x: int, y: int):
+		"""Blends in the weights of the window at (x, y) and returns the filtered map."""
+		self.turn ^= 1
+		current = self.workspace.get("temporal%d" % self.turn, weights.shape, np.float32)
+		np.copyto(current, weights, casting="unsafe")
+		previous, self.map = (self.map, current)
+		if previous is not None:
+			# overlap of the two windows, with the previous one moved by its offset
+			px, py = (int(round(self.origin[0])) - x, int(round(self.origin[1])) - y)
+			h, w = current.shape
+			ph, pw = previous.shape
+			x1, y1, x2, y2 = (max(px, 0), max(py, 0), min(px + pw, w), min(py + ph, h))
+			if x1 < x2 and y1 < y2:
+				new = current[y1:y2, x1:x2]
+				old = previous[y1 - py:y2 - py, x1 - px:x2 - px]
+				np.multiply(new, self.alpha, out=new)
+				np.multiply(old, 1 - self.alpha, out=old)
+				np.add(new, old, out=new)
+		self.origin = (x, y)
+		return current
+
+class Follower:
+	"""Follows a single tracker through a sequence of frames.
+
+	With smoothing (0 to 1) the weights are averaged over time by a TemporalFilter, <smoothing>
+	being the weight of the newest frame, which steadies the mean shift search."""
+	def __init__(self, tracker: Tracker, mode: str = "RGB", color_count: int = 64, iterations: int = 10, epsilon: float = 1, monitor = None, kernel: bool = True, motion: bool = False, quantizer = None, smoothing: float = None) -> None:
+		from monitor import ConfidenceMonitor
+		from workspace import Workspace
+		self.tracker = tracker
+		self.model = Model(mode, color_count, kernel, quantizer)
+		self.iterations = iterations
+		self.epsilon = epsilon
+		self.monitor = monitor or ConfidenceMonitor()
+		self.use_motion = motion
+		self.motion = None
+		self.workspace = Workspace()
+		self.smoothing = smoothing
+		self.filter = TemporalFilter(smoothing, self.workspace) if smoothing else None
+		self.frame = 0
+
+	def window(self, width: int, height: int, margin: int = None) -> tuple:
+		"""Returns the search window (x1, y1, x2, y2) around the tracker, bg_margin wide unless given."""
+		from util import constrain_box
+		x1, y1, x2, y2 = self.tracker.fg_coords()
+		margin = self.tracker.bg_margin if margin is None else margin
+		return constrain_box((x1 - margin, y1 - margin, x2 + margin, y2 + margin), width, height)
+
+	def start(self, frame) -> Tracker:
+		"""Builds the appearance model from the first frame."""
+		from util import image_to_array
+		frame = image_to_array(frame)
+		x1, y1, x2, y2 = self.window(frame.shape[1], frame.shape[0])
+		tracker = self.tracker.offset(x1, y1)
+		self.model.learn(frame[y1:y2, x1:x2], tracker)
+		window = self.model.quantize(frame[y1:y2, x1:x2])
+		self.model.fit(window, tracker)
+		self.monitor.reset(*self.monitor.measure(window, tracker, self.model))
+		if self.use_motion:
+			from motion import MotionModel
+			self.motion = MotionModel(*center(self.tracker), max_margin=max(self.tracker.bg_margin * 4, 1))
+		self.frame = 1
+		return self.tracker
+
+	def shift(self, dx: float, dy: float) -> None:
+		"""Moves the tracker (and its motion model) by a global camera shift."""
+		self.tracker = self.tracker.offset(-int(round(dx)), -int(round(dy)))
+		if self.motion: self.motion.state[:2] += (dx, dy)
+		if self.filter: self.filter.move(dx, dy)
+
+	def step(self, frame) -> Tracker:
+		"""Finds the tracker in the next frame and returns it."""
+		from util import image_to_array
+		frame = image_to_array(frame)
+		h, w = frame.shape[:2]
+
+		# search a larger region while the target is lost
+		margin = self.monitor.search_margin(self.tracker.bg_margin, w, h)
+
+		# otherwise start at the predicted position and only search as far as the prediction is unsure
+		if self.motion:
+			x, y = self.motion.predict()
+			if not self.monitor.lost:
+				cx, cy = center(self.tracker)
+				self.tracker = move_center(self.tracker, x, y)
+				margin = self.motion.margin()
+				# the filtered weights move along with the target
+				if self.filter: self.filter.move(x - cx, y - cy)
+		elif self.filter:
+			# without a motion model the target is assumed to keep its last displacement
+			self.filter.move(*self.filter.velocity)
+
+		x1, y1, x2, y2 = self.window(w, h, margin)
+		window = self.model.quantize(frame[y1:y2, x1:x2], self.workspace)
+		tracker = self.tracker.offset(x1, y1)
+		if self.monitor.lost:
+			tracker = self.monitor.redetect(window, tracker, self.model)
+			# the search window jumps around while the target is lost, the filtered weights don't apply
+			if self.filter: self.filter.reset()
+
+		# refine the position and check how confident we are about it
+		weights = self.model.weights(window, self.workspace)
+		if self.filter: weights = self.filter.update(weights, x1, y1)
+		tracker, iterations = mean_shift(weights, tracker, self.iterations, self.epsilon, self.model.mask(tracker))
+		self.monitor.update(*self.monitor.measure(window, tracker, self.model))
+		if self.filter:
+			(cx, cy), (px, py) = (center(tracker), center(self.tracker))
+			self.filter.velocity = (cx + x1 - px, cy + y1 - py)
+		self.tracker = tracker.offset(-x1, -y1)
+		if logsink.sink.enabled("DEBUG"):
+			logsink.debug("frame %d: %s after %d iterations%s" % (self.frame + 1, self.tracker.fg_coords(), iterations, " (lost)" if self.monitor.lost else ""))
+		if self.motion and not self.monitor.lost:
+			self.motion.correct(*center(self.tracker))
+		self.frame += 1
+		return self.tracker
+
+def track(frames, tracker: Tracker, **kwargs):
+	"""Yields the tracker for every frame of a sequence, starting from its position in the first one."""
+	follower = Follower(tracker, **kwargs)
+	for i, frame in enumerate(frames):
+		yield follower.start(frame) if i == 0 else follower.step(frame)
+
+def track_all(frames, trackers: list, camera: bool = True, **kwargs):
+	"""Yields the list of trackers for every frame of a sequence.
+
+	With camera=True the global camera shift is estimated once per frame and applied to every
+	tracker before its local search, so the search windows don't have to cover camera motion."""
+	from camera import CameraMotion
+	from util import image_to_array
+
+	followers = [Follower(t, **kwargs) for t in trackers]
+	motion = CameraMotion() if camera else None
+	for i, frame in enumerate(frames):
+		frame = image_to_array(frame)
+		if motion:
+			dx, dy = motion.update(frame)
+			if i: [f.shift(dx, dy) for f in followers]
+		yield [f.start(frame) if i == 0 else f.step(frame) for f in followers]
@@ -1,22 +1,4 @@
-class ValueRange():
-	def __init__(self) -> None:
-		self.min = None
-		self.max = None
-	
-	def record(self, val: float) -> None:
-		if self.min is None: self.min = val
-		if self.max is None: self.max = val
-		self.max = max(self.max, val)
-		self.min = min(self.min, val)
-	
-	def reset(self):
-		self.__init__()
-
-	def __str__(self) -> str:
-		return "(%.2f - %.2f)" % (self.min, self.max)
-	
-	def __repr__(self) -> str:
-		return "ValueRange(min: %.2f max: %.2f)" % (self.min, self.max)
+from stats import ValueRange
 
 def constrain(value: float, _min: float, _max: float) -> float:
 	"""Returns given value constrained between _min and _max."""
@@ -28,6 +10,8 @@ def constrained(value: float, _min: float, _max: float) -> bool:
 
 def frequency(arr: list, value: int) -> float:
 	"""Returns frequency of values within the given array."""
+	import numpy as np
+	if isinstance(arr, np.ndarray): return np.count_nonzero(arr == value) / arr.size
 	return arr.count(value)/len(arr)
 
 def count_frequency(arr: list, value: int) -> float:
@@ -58,16 +42,25 @@ def map_range_int(values: list, input_start: float, input_end: float, output_sta
 	if not isinstance(values, list): values = [values]
 	return [round(output_start + ((output_end - output_start) / (input_end - input_start)) * (value - input_start)) for value in values]
 
-# bleh
 def histogram(values: list, b_count: int, range_from: int, range_to: int) -> list:
-	"""Returns a histogram of given values."""
-	from collections import Counter
+	"""Returns a histogram of given values.
 
-	histogram = Counter(map_range_int(values, range_from, range_to, 0, b_count))
-	return [histogram[x] for x in range(1, b_count+1)]
+	Values are mapped to round(b_count * (value - range_from) / (range_to - range_from)) and
+	counted for bins 1 to b_count, as map_range_int would (values landing on 0 aren't counted).
+	For explicit edges and mergeable counts see stats.Histogram."""
+	import numpy as np
+	values = np.asarray(values, dtype=float).ravel()
+	bins = ((b_count / (range_to - range_from)) * (values - range_from) + 0.5).astype(np.intp)
+	bins = bins[(bins >= 1) & (bins <= b_count)]
+	return np.bincount(bins - 1, minlength=b_count).tolist()
 
 def most_common(values: list):
 	"""Returns the most common element from a list of elements."""
+	import numpy as np
+	if isinstance(values, np.ndarray):
+		# the smallest value wins a tie
+		values, counts = np.unique(values, return_counts=True)
+		return values[counts.argmax()]
 	from collections import Counter
 	return Counter(values).most_common(1)[0][0]
 
@@ -76,7 +69,9 @@ def normalize_rgb(pixel: tuple) -> list:
 	return (int(pixel[0] / sum(pixel) * 255), int(pixel[1] / sum(pixel) * 255), int(pixel[2] / sum(pixel) * 255))
 
 def image_to_array(img):
-	from numpy import flipud, rot90, array
+	from numpy import flipud, rot90, array, ndarray
+	# decoded frames (e.g. from the frame cache) are used as they are
+	if isinstance(img, ndarray): return img
 	#return flipud(rot90(array(img.convert("RGB")), 1)).astype(int)
 	return array(img.convert("RGB")).astype(int)
 
@@ -104,6 +99,10 @@ def integral_get_area(itg, x0, y0, x1, y1):
 def integral_get_point(itg, x, y):
 	return integral_get_area(itg, x-1, y-1, x, y)
 
+def integral_box_sums(itg, width: int, height: int):
+	"""Returns the sums of every width*height box of an integral image, indexed by the box's top left [y, x]."""
+	return itg[height:, width:] - itg[:-height, width:] - itg[height:, :-width] + itg[:-height, :-width]
+
 def any_eq(str1, str2):
 	"""Return whether every character in str1 is present in str2."""
 	return sum([ch in str2 for ch in list(str1)]) > 0
@@ -199,54 +198,119 @@ def log_likelihood_ratio(fg: list, bg: list, i: int) -> float:
 	from math import log10
 	return max(-1, min(1, log10(max(count_frequency(fg, i), 0.00001) / max(count_frequency(bg, i), 0.00001))))
 
-def likelihood_image(image, tracker, mode = "RGB", color_count = 64):
-	import numpy as np
-
-	# constrain the color count
-	color_count = constrain(color_count, 1, 255)
+def constrain_box(coords: tuple, width: int, height: int) -> tuple:
+	"""Returns (x1, y1, x2, y2) coordinates constrained to an image of given size."""
+	x1, y1, x2, y2 = coords
+	return (int(constrain(x1, 0, width)), int(constrain(y1, 0, height)), int(constrain(x2, 0, width)), int(constrain(y2, 0, height)))
 
-	# load image data
-	img = image_to_array(image)
-	w = image.width
-	h = image.height
+def quantize(img, mode = "RGB", color_count = 64, out = None, scratch = None):
+	"""Returns the selected RGB channels of an image array averaged into color_count+1 bins.
 
+	If out (an integer array) and scratch (a float64 array) of the image's height and width are
+	given, the result is written into out without allocating any full-size arrays."""
+	selector = ["R" in mode, "G" in mode, "B" in mode]
+	if out is None: return (img[..., selector].mean(2) / 255 * color_count).astype(int)
+
+	# same operations as above, done in place one channel at a time
+	from numpy import copyto, add, divide, multiply
+	channels = [i for i in range(3) if selector[i]]
+	copyto(scratch, img[..., channels[0]])
+	for c in channels[1:]: add(scratch, img[..., c], out=scratch)
+	divide(scratch, len(channels), out=scratch)
+	divide(scratch, 255, out=scratch)
+	multiply(scratch, color_count, out=scratch)
+	copyto(out, scratch, casting="unsafe")
+	return out
+
+def feature_weights() -> list:
+	"""Returns the 49 distinct (w1, w2, w3) feature weights of w1*R + w2*G + w3*B with w in [-2, 2], as in the paper."""
+	from itertools import product
+	from math import gcd
+
+	weights = []
+	for w in product(range(-2, 3), repeat=3):
+		# skip the zero vector, multiples of other weights and their negatives
+		if gcd(gcd(abs(w[0]), abs(w[1])), abs(w[2])) != 1: continue
+		if [x for x in w if x][0] < 0: continue
+		weights.append(w)
+	return weights
+
+def quantize_feature(img, weights: tuple, color_count = 64):
+	"""Returns the linear RGB feature w1*R + w2*G + w3*B of an image array, rescaled into color_count+1 bins."""
+	from numpy import asarray
+	w = asarray(weights, dtype=float)
+	low  = 255 * w[w < 0].sum()
+	high = 255 * w[w > 0].sum()
+	return ((img[..., :3] @ w - low) / (high - low) * color_count).astype(int)
+
+def region_counts(img, tracker, color_count: int, kernel = None) -> tuple:
+	"""Returns the fg and bg histograms of a quantized image array under a tracker.
+
+	If a kernel (a weight mask the size of the fg box) is given, the fg pixels are counted with its weights."""
+	from numpy import bincount
+	from math import floor
+
+	h, w = img.shape[:2]
+	fx1, fy1, fx2, fy2 = constrain_box(tracker.fg_coords(), w, h)
+	bx1, by1, bx2, by2 = constrain_box(tracker.bg_coords(), w, h)
+
+	# the fg box always lies inside the bg box, so the ring is their difference
+	fg_count = bincount(img[fy1:fy2, fx1:fx2].ravel(), minlength=color_count + 1)
+	bg_count = bincount(img[by1:by2, bx1:bx2].ravel(), minlength=color_count + 1) - fg_count
+	if kernel is None: return (fg_count, bg_count)
+
+	# only use the part of the kernel that's inside the image
+	x1, y1, _, _ = tracker.fg_coords()
+	kx, ky = (fx1 - floor(x1), fy1 - floor(y1))
+	weights = kernel[ky:ky + fy2 - fy1, kx:kx + fx2 - fx1]
+	fg = img[fy1:fy1 + weights.shape[0], fx1:fx1 + weights.shape[1]]
+	return (bincount(fg.ravel(), weights=weights.ravel(), minlength=color_count + 1), bg_count)
+
+def log_likelihood_ratios(fg_count, bg_count):
+	"""Returns log_likelihood_ratio for every bin of the fg and bg count arrays at once."""
+	import numpy as np
+	fg_f = fg_count / (fg_count.sum() or 1)
+	bg_f = bg_count / (bg_count.sum() or 1)
+	return np.clip(np.log10(np.maximum(fg_f, 0.00001) / np.maximum(bg_f, 0.00001)), -1, 1)
+
+def variance_ratio(fg_count, bg_count, ratios = None) -> float:
+	"""Returns the variance ratio of the log likelihood ratios between fg and bg (higher separates better)."""
+	p = fg_count / (fg_count.sum() or 1)
+	q = bg_count / (bg_count.sum() or 1)
+	L = log_likelihood_ratios(fg_count, bg_count) if ratios is None else ratios
+
+	def var(a): return (a * L * L).sum() - (a * L).sum() ** 2
+	return float(var((p + q) / 2) / max(var(p) + var(q), 0.00001))
+
+def likelihood_table(ratios):
+	"""Returns a lookup table mapping each bin to its 8-bit likelihood value."""
+	from numpy import uint8
+	return ((ratios + 1) * 127).astype(uint8) + 1
+
+def likelihood_counts(image, tracker, mode = "RGB", color_count = 64) -> tuple:
+	"""Returns the quantized image array with its fg and bg histograms, or None for an invalid mode."""
 	# combine selected RGB pixels into single desired value
 	if not any_eq("RGB", mode.upper()): return
-	selector = ["R" in mode, "G" in mode, "B" in mode]
-	img = (img[..., selector].mean(2) / 255 * color_count).astype(int)
+	img = quantize(image_to_array(image), mode, color_count)
 
-	# shorten tracker variables
-	tx = tracker.x
-	ty = tracker.y
-	tw = tracker.width
-	th = tracker.height
-	bm = tracker.bg_margin
+	# count the values under the fg and bg masks
+	fg_count, bg_count = region_counts(img, tracker, color_count)
+	return (img, fg_count, bg_count)
 
-	# initiate fg and bg arrays
-	fg = np.zeros_like(img)
-	bg = np.zeros_like(img)
-
-	# compute the fg and bg masks
-	fg[ty:ty+th, tx:tx+tw] = 1
-	bg[ty-bm:ty+tw+bm, tx-bm:tx+tw+bm] = 1
-	bg = bg - fg
-
-	fg_count = [0] * (color_count + 1)
-	bg_count = [0] * (color_count + 1)
-	for i in range(color_count + 1):
-		# only choose the values we're currently working with
-		val = img == i
-
-		# apply fg and bg masks and count the values
-		fg_count[i] = (val * fg).sum()
-		bg_count[i] = (val * bg).sum()
+def likelihood_image(image, tracker, mode = "RGB", color_count = 64):
+	# constrain the color count
+	color_count = int(constrain(color_count, 1, 255))
 
-	# calculate the ratios
-	ratios = [log_likelihood_ratio(fg_count, bg_count, x) for x in range(color_count+1)]
+	counts = likelihood_counts(image, tracker, mode, color_count)
+	if counts is None: return
+	img, fg_count, bg_count = counts
 
-	# apply the ratios to the image
-	for i in range(color_count + 1):
-		img[img == i] = int((ratios[i] + 1) * 127) + 1
+	# calculate the ratios and apply them to the image
+	table = likelihood_table(log_likelihood_ratios(fg_count, bg_count))
+	return array_to_image(table[img])
 
-	# return the image
-	return array_to_image(img)
+def remap(table, img, out = None):
+	"""Returns table[img], written into out if it's given."""
+	from numpy import take
+	# mode="raise" would buffer out, and the bins are always in range anyway
+	return take(table, img, out=out, mode="clip")
@@ -0,0 +1,50 @@
+import numpy as np
+
+class Workspace:
+	"""Reusable buffers for the likelihood pipeline.
+
+	Buffers are kept by name and only reallocated when a larger one is needed, so once a tracking
+	loop has seen its largest search window it performs no full-size allocations per frame. Arrays
+	returned by a workspace are overwritten by the next call that uses the same buffer."""
+	def __init__(self) -> None:
+		self.buffers = {}
+
+	def get(self, name: str, shape: tuple, dtype = np.float64):
+		"""Returns an uninitialized array of the given shape backed by the named buffer."""
+		size = int(np.prod(shape))
+		buffer = self.buffers.get(name)
+		if buffer is None or buffer.dtype != dtype or buffer.size < size:
+			buffer = self.buffers[name] = np.empty(size, dtype=dtype)
+		return buffer[:size].reshape(shape)
+
+	def quantize(self, img, mode: str = "RGB", color_count: int = 64):
+		"""Returns util.quantize of an image array, written into the "quantized" buffer."""
+		from util import quantize
+		shape = img.shape[:2]
+		return quantize(img, mode, color_count, out=self.get("quantized", shape, np.intp), scratch=self.get("scratch", shape))
+
+	def lookup(self, quantizer, img):
+		"""Returns the bins of a quantizer.Quantizer for an image array, written into the "quantized" buffer."""
+		shape = img.shape[:2]
+		return quantizer(img, out=self.get("quantized", shape, quantizer.lut.dtype), scratch=self.get("index", shape, np.intp))
+
+	def remap(self, table, img, name: str = "remapped"):
+		"""Returns table[img], written into the named buffer."""
+		from util import remap
+		return remap(table, img, out=self.get(name, img.shape, table.dtype))
+
+	def likelihood(self, image, tracker, mode: str = "RGB", color_count: int = 64):
+		"""Returns the likelihood array of util.likelihood_image, without allocating the full-size intermediates."""
+		from util import any_eq, constrain, image_to_array, region_counts, log_likelihood_ratios, likelihood_table
+		color_count = int(constrain(color_count, 1, 255))
+		if not any_eq("RGB", mode.upper()): return
+		img = self.quantize(image_to_array(image), mode, color_count)
+		fg_count, bg_count = region_counts(img, tracker, color_count)
+		return self.remap(likelihood_table(log_likelihood_ratios(fg_count, bg_count)), img, "likelihood")
+
+	@property
+	def nbytes(self) -> int:
+		return sum(b.nbytes for b in self.buffers.values())
+
+	def __repr__(self) -> str:
+		return "Workspace(buffers: %s, nbytes: %d)" % (", ".join(self.buffers), self.nbytes)
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+
+OUTLINE = "#00ff00"
+
+def overlay(frame, likelihood, offset: tuple = (0, 0), alpha: float = 0.5, color: tuple = (255, 0, 0)):
+	"""Blends an 8-bit likelihood array into an RGB frame array in place, as <color> where it's high, at (x, y) <offset>."""
+	h, w = frame.shape[:2]
+	x, y = offset
+	lh, lw = likelihood.shape[:2]
+	x1, y1, x2, y2 = (max(x, 0), max(y, 0), min(x + lw, w), min(y + lh, h))
+	if x1 >= x2 or y1 >= y2: return frame
+	weight = likelihood[y1 - y:y2 - y, x1 - x:x2 - x, None] * (alpha / 255)
+	region = frame[y1:y2, x1:x2]
+	region[...] = region * (1 - weight) + np.array(color) * weight
+	return frame
+
+def annotate(frame, boxes: list, likelihoods: list = None, alpha: float = 0.5):
+	"""Returns a PIL image of an RGB frame array with the fg and bg rectangles of the boxes drawn on it, as Tracker.tk_draw draws them.
+
+	Boxes are (fg coords, bg coords) pairs. Likelihoods are 8-bit arrays the size of the frame,
+	or (array, (x, y)) crops, blended in before the rectangles are drawn."""
+	from PIL import Image, ImageDraw
+	if likelihoods:
+		frame = np.array(frame)
+		for likelihood in likelihoods:
+			if isinstance(likelihood, tuple): overlay(frame, likelihood[0], likelihood[1], alpha)
+			else: overlay(frame, likelihood, alpha=alpha)
+	image = Image.fromarray(np.asarray(frame, dtype=np.uint8))
+	draw = ImageDraw.Draw(image)
+	for fg, bg in boxes:
+		# PIL includes the bottom right corner, the canvas doesn't
+		for x1, y1, x2, y2 in (fg, bg):
+			draw.rectangle((x1, y1, x2 - 1, y2 - 1), outline=OUTLINE)
+	return image
+
+class FrameWriter:
+	"""Writes annotated frames as an image sequence from background threads.
+
+	write() only queues the frame, the drawing and encoding happen on <threads> writer threads.
+	The queue holds at most <queue_size> frames. When it's full write() waits for a free slot,
+	or with block=False drops the frame (counted in <dropped>), so memory use stays bounded
+	either way. Frames mustn't be modified after they're written."""
+	def __init__(self, path: str, queue_size: int = 8, threads: int = 1, pattern: str = "%06d.png", block: bool = True, alpha: float = 0.5) -> None:
+		from queue import Queue
+		from threading import Lock, Thread
+		self.path = os.path.join(path, "")
+		os.makedirs(self.path, exist_ok=True)
+		self.pattern = pattern
+		self.block = block
+		self.alpha = alpha
+		self.queue = Queue(maxsize=queue_size)
+		self.index = 0
+		self.written = 0
+		self.dropped = 0
+		self.error = None
+		self.lock = Lock()
+		self.threads = [Thread(target=self.run, daemon=True) for _ in range(threads)]
+		for thread in self.threads: thread.start()
+
+	def run(self) -> None:
+		while True:
+			item = self.queue.get()
+			if item is None: break
+			index, frame, boxes, likelihoods = item
+			try:
+				annotate(frame, boxes, likelihoods, self.alpha).save(self.path + self.pattern % index)
+				with self.lock: self.written += 1
+			except Exception as e:
+				self.error = e
+
+	def write(self, frame, trackers: list, likelihoods: list = None) -> None:
+		"""Queues a frame with the trackers (and optional likelihoods, see annotate) to draw on it."""
+		from queue import Full
+		if self.error: raise self.error
+		# the boxes are taken now, the trackers may have moved by the time the frame is drawn
+		item = (self.index, frame, [(tracker.fg_coords(), tracker.bg_coords()) for tracker in trackers], likelihoods)
+		self.index += 1
+		try: self.queue.put(item, block=self.block)
+		except Full: self.dropped += 1
+
+	def close(self) -> None:
+		"""Waits for the queued frames to be written."""
+		for _ in self.threads: self.queue.put(None)
+		for thread in self.threads: thread.join()
+		if self.error: raise self.error
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args) -> None:
+		self.close()
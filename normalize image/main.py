@@ -1,17 +1,10 @@
-from PIL import Image
-from normalize import normalize
+import sys
+from normalize import normalize_file
 
 root = __file__[:__file__.rfind("/")+1]
 
-# load image
-img = Image.open(f"{root}img/src.png").convert("RGB")
-
-#load pixels
-pix = list(img.getdata())
-
-# create output image image
-out_img = Image.new(img.mode, img.size)
-out_img.putdata(normalize(pix))
-
-# save output image
-out_img.save(f"{root}img/normalized.png")
+# stream the image band by band: main.py [<source> <destination .png/.ppm/.npy>]
+if len(sys.argv) == 3:
+	normalize_file(sys.argv[1], sys.argv[2])
+else:
+	normalize_file(f"{root}img/src.png", f"{root}img/normalized.png")
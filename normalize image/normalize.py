@@ -7,6 +7,119 @@
 #
 # 	pix[i] = (normalized_r, normalized_g, normalized_b)
 
+import struct
+import zlib
+import numpy as np
+
 def normalize(pixels: list) -> list:
 	"""Returns a list of normalized RGB values from list of RGB tuples."""
 	return [(int(rgb[0] / sum(rgb) * 255), int(rgb[1] / sum(rgb) * 255), int(rgb[2] / sum(rgb) * 255)) for rgb in list(pixels)]
+
+def normalize_array(rgb, out = None):
+	"""Returns the normalized (..., 3) uint8 array of an RGB array, same values as normalize (black stays black)."""
+	if out is None: out = np.empty(rgb.shape, dtype=np.uint8)
+	total = rgb.sum(-1, dtype=np.float64)
+	for c in range(3):
+		channel = np.divide(rgb[..., c], total, out=np.zeros(total.shape), where=total > 0)
+		np.multiply(channel, 255, out=channel)
+		out[..., c] = channel
+	return out
+
+def open_ppm(path: str):
+	"""Returns the (height, width, 3) pixels of a binary PPM (P6) file, memory-mapped."""
+	with open(path, "rb") as file:
+		# header: magic, width, height and maximum value, separated by whitespace, with # comments
+		fields = []
+		while len(fields) < 4:
+			line = file.readline()
+			if not line: raise Exception(f"Truncated PPM header in {path}")
+			fields += line.split(b"#")[0].split()
+		offset = file.tell()
+	if fields[0] != b"P6" or int(fields[3]) != 255: raise Exception(f"{path} isn't an 8-bit binary PPM")
+	width, height = (int(fields[1]), int(fields[2]))
+	return np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(height, width, 3))
+
+def open_source(path: str):
+	"""Returns the (height, width, 3) RGB pixels of an image file.
+
+	.ppm and .npy files are memory-mapped, so only the rows that are read are ever in memory.
+	Other formats are decoded whole by PIL, once, as a uint8 array."""
+	if path.lower().endswith(".ppm"): return open_ppm(path)
+	if path.lower().endswith(".npy"): return np.load(path, mmap_mode="r")
+	from PIL import Image
+	return np.asarray(Image.open(path).convert("RGB"))
+
+class PPMWriter:
+	"""Writes a binary PPM file a band of rows at a time."""
+	def __init__(self, path: str, width: int, height: int) -> None:
+		self.file = open(path, "wb")
+		self.file.write(b"P6\n%d %d\n255\n" % (width, height))
+
+	def write(self, band) -> None:
+		self.file.write(np.ascontiguousarray(band, dtype=np.uint8).tobytes())
+
+	def close(self) -> None:
+		self.file.close()
+
+class NPYWriter:
+	"""Writes a .npy file a band of rows at a time."""
+	def __init__(self, path: str, width: int, height: int) -> None:
+		self.array = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(height, width, 3))
+		self.row = 0
+
+	def write(self, band) -> None:
+		self.array[self.row:self.row + len(band)] = band
+		self.row += len(band)
+
+	def close(self) -> None:
+		self.array.flush()
+		del self.array
+
+class PNGWriter:
+	"""Writes an 8-bit RGB PNG file a band of rows at a time, compressing as it goes."""
+	def __init__(self, path: str, width: int, height: int, level: int = 6) -> None:
+		self.file = open(path, "wb")
+		self.file.write(b"\x89PNG\r\n\x1a\n")
+		self.chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+		self.compressor = zlib.compressobj(level)
+
+	def chunk(self, kind: bytes, data: bytes) -> None:
+		self.file.write(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data)))
+
+	def write(self, band) -> None:
+		# every row gets the "sub" filter: the difference to the pixel on its left
+		rows = band.reshape(len(band), -1)
+		filtered = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+		filtered[:, 0] = 1
+		filtered[:, 1:4] = rows[:, :3]
+		np.subtract(rows[:, 3:], rows[:, :-3], out=filtered[:, 4:])
+		data = self.compressor.compress(filtered.tobytes())
+		if data: self.chunk(b"IDAT", data)
+
+	def close(self) -> None:
+		self.chunk(b"IDAT", self.compressor.flush())
+		self.chunk(b"IEND", b"")
+		self.file.close()
+
+WRITERS = {".png": PNGWriter, ".ppm": PPMWriter, ".npy": NPYWriter}
+
+def normalize_file(src: str, dst: str, band_pixels: int = 1 << 20) -> None:
+	"""Normalizes an image file into another a band of rows at a time, about <band_pixels> pixels per band.
+
+	The output is .png, .ppm or .npy. Reading from a .ppm or .npy file too, memory use stays at a
+	few bands whatever the size of the image."""
+	import os
+	pixels = open_source(src)
+	height, width = pixels.shape[:2]
+	extension = os.path.splitext(dst)[1].lower()
+	if not extension in WRITERS: raise Exception(f"Can't stream {extension} files, use one of {', '.join(WRITERS)}")
+
+	rows = max(band_pixels // width, 1)
+	band = np.empty((rows, width, 3), dtype=np.uint8)
+	writer = WRITERS[extension](dst, width, height)
+	try:
+		for y in range(0, height, rows):
+			n = min(rows, height - y)
+			writer.write(normalize_array(pixels[y:y + n], band[:n]))
+	finally:
+		writer.close()